@@ -0,0 +1,333 @@
+"""Benchmarks of the hot paths of click-config.
+
+Usage:
+
+    python benchmarks/bench.py                         # run all benchmarks
+    python benchmarks/bench.py --save results.json     # store the results
+    python benchmarks/bench.py --compare benchmarks/baseline.json
+
+In comparison mode, the command fails if a benchmark is slower than in the
+baseline by more than the threshold (default: 50%, as microbenchmarks are
+noisy). Timings depend on the machine, hence the baseline should be recreated
+(`--save`) when switching to a different reference machine.
+"""
+
+import atexit
+import gc
+import json
+import platform
+import re
+import sys
+import tempfile
+import time
+from dataclasses import field, make_dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import click
+from click.testing import CliRunner
+
+from click_config.core import add_click_options, from_dict
+from click_config.series import Series
+from click_config.util import read_config_file, write_config_file
+
+# config sizes (number of fields) and series sizes (number of points)
+FIELD_COUNTS = (10, 100, 1000)
+POINT_COUNTS = (10, 1000, 10**6)
+FORMATS = ("json", "yaml", "toml")
+
+QUICK_FIELD_COUNTS = (10,)
+QUICK_POINT_COUNTS = (10,)
+
+# a benchmark returns a setup function which prepares (and returns) the
+# timed function, as well as the number of operations per call
+Benchmark = Tuple[Callable[[], Callable[[], Any]], int]
+
+
+def make_config_cls(n_fields: int):
+    return make_dataclass(
+        f"Config{n_fields}",
+        [(f"field_{i}", int, field(default=i)) for i in range(n_fields)],
+    )
+
+
+def config_data(n_fields: int) -> Dict[str, Any]:
+    return {f"field_{i}": i + 1 for i in range(n_fields)}
+
+
+def make_command_func():
+    # options are attached to the function: use a new one for each command
+    def command_func(config):
+        pass
+
+    return command_func
+
+
+def bench_decorate(n_fields: int) -> Benchmark:
+    def setup():
+        # a new class each time: the schema of a class is cached
+        config_cls = make_config_cls(n_fields)
+        func = make_command_func()
+        return lambda: add_click_options(func, config_cls, "config")
+
+    return setup, 1
+
+
+def bench_invoke(n_fields: int) -> Benchmark:
+    config_cls = make_config_cls(n_fields)
+    cli = click.command()(
+        add_click_options(make_command_func(), config_cls, "config")
+    )
+    runner = CliRunner()
+
+    def invoke():
+        result = runner.invoke(cli, ["--field_0", "5"])
+        assert result.exit_code == 0, result.output
+
+    return lambda: invoke, 1
+
+
+def bench_series(n_points: int) -> Benchmark:
+    # axes with 10 values each (and a remainder axis)
+    axes: Dict[str, Any] = {}
+    remaining = n_points
+
+    while remaining >= 10:
+        axes[f"axis_{len(axes)}"] = list(range(10))
+        remaining //= 10
+
+    if remaining > 1:
+        axes[f"axis_{len(axes)}"] = list(range(remaining))
+
+    def expand():
+        for _ in Series({"fixed": 0}, axes):
+            pass
+
+    return lambda: expand, n_points
+
+
+def bench_from_dict(n_fields: int) -> Benchmark:
+    config_cls = make_config_cls(n_fields)
+    data = config_data(n_fields)
+    n_calls = max(10, 10_000 // n_fields)
+
+    def build():
+        for _ in range(n_calls):
+            from_dict(config_cls, data)
+
+    return lambda: build, n_calls
+
+
+def bench_to_dict(n_fields: int) -> Benchmark:
+    from click_config import ConfigClass
+
+    config_cls = make_dataclass(
+        f"Config{n_fields}",
+        [(f"field_{i}", int, field(default=i)) for i in range(n_fields)],
+        bases=(ConfigClass,),
+    )
+    config = config_cls()
+    n_calls = max(10, 10_000 // n_fields)
+
+    def convert():
+        for _ in range(n_calls):
+            config.to_dict()
+
+    return lambda: convert, n_calls
+
+
+@lru_cache(maxsize=None)
+def work_dir() -> Path:
+    # removed once the process exits
+    directory = tempfile.TemporaryDirectory(prefix="click-config-bench-")
+    atexit.register(directory.cleanup)
+    return Path(directory.name)
+
+
+def bench_read(file_format: str, n_fields: int) -> Benchmark:
+    path = work_dir() / f"read-{n_fields}.{file_format}"
+    write_config_file(path, config_data(n_fields))
+
+    return lambda: lambda: read_config_file(path), 1
+
+
+def bench_write(file_format: str, n_fields: int) -> Benchmark:
+    path = work_dir() / f"write-{n_fields}.{file_format}"
+    data = config_data(n_fields)
+
+    return lambda: lambda: write_config_file(path, data), 1
+
+
+def benchmarks(quick: bool = False) -> Iterator[Tuple[str, Callable]]:
+    """Yield the name and (lazy) definition of each benchmark."""
+    field_counts = QUICK_FIELD_COUNTS if quick else FIELD_COUNTS
+    point_counts = QUICK_POINT_COUNTS if quick else POINT_COUNTS
+
+    for n in field_counts:
+        yield f"decorate[fields={n}]", lambda n=n: bench_decorate(n)
+        yield f"invoke[fields={n}]", lambda n=n: bench_invoke(n)
+        yield f"from_dict[fields={n}]", lambda n=n: bench_from_dict(n)
+        yield f"to_dict[fields={n}]", lambda n=n: bench_to_dict(n)
+
+    for n in point_counts:
+        yield f"series[points={n}]", lambda n=n: bench_series(n)
+
+    for file_format in FORMATS:
+        for n in field_counts:
+            yield (
+                f"read[{file_format},fields={n}]",
+                lambda f=file_format, n=n: bench_read(f, n),
+            )
+            yield (
+                f"write[{file_format},fields={n}]",
+                lambda f=file_format, n=n: bench_write(f, n),
+            )
+
+
+def measure(benchmark: Benchmark, repeat: int, min_time: float) -> float:
+    """Return the best time (in seconds) per operation.
+
+    Each repetition calls the timed function until `min_time` has passed.
+    """
+    setup, n_ops = benchmark
+    best = float("inf")
+
+    # run once to warm up caches (e.g. imports of file format backends)
+    setup()()
+
+    for _ in range(repeat):
+        elapsed = 0.0
+        n_calls = 0
+
+        # like timeit, exclude garbage collection from the measurements
+        gc.collect()
+        gc.disable()
+
+        try:
+            while n_calls == 0 or elapsed < min_time:
+                func = setup()
+                start = time.perf_counter()
+                func()
+                elapsed += time.perf_counter() - start
+                n_calls += 1
+        finally:
+            gc.enable()
+
+        best = min(best, elapsed / n_calls / n_ops)
+
+    return best
+
+
+def compare(
+    results: Dict[str, float], baseline: Dict[str, float], threshold: float
+) -> Dict[str, float]:
+    """Return the ratios of the benchmarks which regressed."""
+    regressions = {}
+
+    for name, seconds in results.items():
+        if name not in baseline:
+            continue
+
+        ratio = seconds / baseline[name]
+
+        if ratio > 1 + threshold:
+            regressions[name] = ratio
+
+    return regressions
+
+
+def format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f}{unit}"
+    return f"{seconds / 1e-9:.0f}ns"
+
+
+@click.command()
+@click.option("--quick", is_flag=True, help="Only use the smallest sizes.")
+@click.option(
+    "-k", "pattern", default=None, help="Only run matching benchmarks."
+)
+@click.option("--repeat", default=5, show_default=True, type=int)
+@click.option(
+    "--min-time",
+    default=0.05,
+    show_default=True,
+    type=float,
+    help="Minimum time (in seconds) of each repetition.",
+)
+@click.option("--save", type=click.Path(dir_okay=False), default=None)
+@click.option(
+    "--compare",
+    "baseline_path",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="Fail if benchmarks are slower than in this baseline.",
+)
+@click.option(
+    "--threshold",
+    default=0.5,
+    show_default=True,
+    type=float,
+    help="Tolerated slowdown (relative to the baseline).",
+)
+def main(
+    quick: bool,
+    pattern: Optional[str],
+    repeat: int,
+    min_time: float,
+    save: Optional[str],
+    baseline_path: Optional[str],
+    threshold: float,
+):
+    """Run the benchmarks (times are given per operation)."""
+    baseline: Dict[str, float] = {}
+
+    if baseline_path is not None:
+        with open(baseline_path, "r", encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+
+    results = {}
+
+    for name, definition in benchmarks(quick):
+        if pattern is not None and not re.search(pattern, name):
+            continue
+
+        seconds = measure(definition(), repeat, min_time)
+        results[name] = seconds
+
+        line = f"{name:<32} {format_time(seconds):>10}"
+
+        if name in baseline:
+            line += f" {seconds / baseline[name]:>8.2f}x baseline"
+
+        click.echo(line)
+
+    if save is not None:
+        with open(save, "w", encoding="utf-8") as results_file:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "results": results,
+                },
+                results_file,
+                indent=2,
+            )
+
+    regressions = compare(results, baseline, threshold)
+
+    if regressions:
+        lines = [
+            f"{name}: {ratio:.2f}x slower than baseline"
+            for name, ratio in sorted(regressions.items())
+        ]
+        raise click.ClickException(
+            f"{len(regressions)} benchmark(s) regressed by more than "
+            f"{threshold:.0%}:\n" + "\n".join(lines)
+        )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,7 @@
 """This module shows a examplatory usage of the click-config package.
 
 $ python examples/simple.py --epochs 10 --lr 1.0 -o path --optimizer sgd -h 1 -h 2
-Config(epochs=10, learning_rate=1.0, output_dir=PosixPath('path'), comment='', optimizer='sgd', hidden_sizes=(1, 2))
+Config(epochs=10, learning_rate=1.0, output_dir=PosixPath('path'), comment='', optimizer='sgd', hidden_sizes=[1, 2])
 """
 
 
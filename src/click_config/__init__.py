@@ -1,8 +1,15 @@
-from dataclasses import dataclass
+from importlib import import_module
 
-from click import argument, command, option
+# avoid importing typing just for this (recognized by type checkers)
+TYPE_CHECKING = False
 
-from .core import ConfigClass, click_config_options, field
+if TYPE_CHECKING:
+    from dataclasses import dataclass
+
+    from click import argument, command, option
+
+    from .core import ConfigClass, click_config_options, field
+    from .identity import fingerprint
 
 __all__ = [
     "field",
@@ -12,4 +19,35 @@ __all__ = [
     "option",
     "argument",
     "ConfigClass",
+    "fingerprint",
 ]
+
+# the public names are only imported once they are accessed (which keeps
+# startup of cli scripts and shell completion fast)
+_lazy_attributes = {
+    "field": "click_config.core",
+    "click_config_options": "click_config.core",
+    "command": "click",
+    "dataclass": "dataclasses",
+    "option": "click",
+    "argument": "click",
+    "ConfigClass": "click_config.core",
+    "fingerprint": "click_config.identity",
+}
+
+
+def __getattr__(name):
+    try:
+        module_name = _lazy_attributes[name]
+    except KeyError:
+        raise AttributeError(
+            f"module {__name__!r} has no attribute {name!r}"
+        ) from None
+
+    value = getattr(import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,30 +1,58 @@
 """Core functionality of click_config."""
 
+import inspect
 import logging
-from dataclasses import MISSING, Field
+import os
+import time
 from dataclasses import field as dataclasses_field
-from dataclasses import fields
 from functools import wraps
-from itertools import product
+from importlib import import_module
 from os import PathLike
 from typing import (
+    AbstractSet,
     Any,
     Callable,
     Dict,
-    Literal,
+    Iterable,
+    Iterator,
+    List,
     Mapping,
     Optional,
+    Sequence,
     Tuple,
     Type,
-    Union,
-    get_args,
-    get_origin,
 )
 
 import click
-from docstring_parser import parse as parse_docstring
 
+from .costs import CostModel, DurationLog
+from .events import Event, Observer
+from .identity import canonicalize, fingerprint
+from .manifest import Manifest
+from .memo import RunCache, run_key
+from .profiling import make_profile_directory, merge_profiles, profiled
+from .runner import (
+    RunResult,
+    SeriesFailed,
+    call_and_report,
+    fork_available,
+    isolated,
+    isolation_available,
+    run_concurrently,
+    run_parallel,
+)
+from .schema import (
+    ConfigOption,
+    ConfigSchema,
+    InvalidFieldValue,
+    RequiredFieldMissing,
+    get_schema,
+    lazy_help_option,
+)
+from .series import Constraint, Series
 from .util import read_config_file, write_config_file
+from .watch import Changes, ConfigWatcher
+from .workqueue import WorkQueue, work_on_queue
 
 _dataclass_field_kw_names = {
     "default",
@@ -38,78 +66,24 @@ _dataclass_field_kw_names = {
 }
 
 
-class RequiredFieldMissing(RuntimeError):
-    def __init__(self, field_name):
-        text = f"Required field '{field_name}' was not set."
-        super().__init__(text)
-        self.field_name = field_name
-        self.message = text
-
-
-def get_param_decls(_field: Field) -> Tuple:
-    """Return complete `param_decls` for click option."""
-    partial_param_decls = _field.metadata.get("partial_param_decls", ())
-
-    if len(partial_param_decls) == 0:
-        # if no cli option was given, construct from identifier
-        partial_param_decls = (f"--{_field.name}",)
-
-    return partial_param_decls + (_field.name,)
-
-
-def get_attrs(_field: Field) -> Dict[str, Any]:
-    """Generate attributes used for creating click options."""
-
-    multiple = False
-    click_type: Any = None
-
-    # annotation of the field, retrieved by dataclass
-    annotation = _field.type
-
-    # generic base type (such as list, Literal)
-    origin = get_origin(annotation)
+class ShardParamType(click.ParamType):
+    """Click type for shards given as `i/n` (with `0 <= i < n`)."""
 
-    if origin is not None:
-        if origin is Literal:
-            click_type = click.Choice(get_args(annotation))
-        elif origin is list:
-            multiple = True
-            args = get_args(annotation)
+    name = "i/n"
 
-            if len(args) == 1:
-                click_type = args[0]
-        elif origin is Union:
-            # potentially an optional field
-            args = get_args(annotation)
-            if str in args:
-                click_type = str
-            elif len(args) == 2:
-                click_type = args[0]
+    def convert(self, value, param, ctx):
+        if isinstance(value, tuple):
+            return value
 
-    elif issubclass(annotation, list):
-        multiple = True
-
-    else:
-        click_type = annotation
-
-    attrs = dict(_field.metadata.get("attrs", {}))
-
-    if multiple:
-        # test if multiple was explicitly set to false
-        assert attrs.get("multiple", True), (
-            f"Annotation '{annotation}' is not compatible with the"
-            "provided field (as multiple is set to False)."
-        )
-
-        attrs["multiple"] = True
-
-    if "type" not in attrs and click_type is not None:
-        # type has not been set explicitly
-        attrs["type"] = click_type
+        try:
+            index, count = (int(part) for part in value.split("/"))
+        except ValueError:
+            self.fail(f"{value!r} is not of the form 'i/n'.", param, ctx)
 
-    attrs["default"] = None  # defaults are handled by dataclass
+        if not 0 <= index < count:
+            self.fail(f"{value!r} requires 0 <= i < n.", param, ctx)
 
-    return attrs
+        return index, count
 
 
 def field(*param_decls: str, **kw: Any):
@@ -142,32 +116,32 @@ def field(*param_decls: str, **kw: Any):
 def check_required_fields(cls: Type, data: Mapping):
     # if cls is dataclass, check if all required fields are set
     try:
-        for _field in fields(cls):
-            if (
-                _field.default is MISSING
-                and _field.default_factory is MISSING
-                and _field.name not in data
-            ):
-                raise RequiredFieldMissing(_field.name)
+        required = get_schema(cls).required
     except TypeError:
         # not a dataclass, skip field checking
-        pass
+        return
+
+    for field_name in required:
+        if field_name not in data:
+            raise RequiredFieldMissing(field_name)
 
 
 def from_dict(cls, data: Mapping, overwrite: Optional[Mapping] = None):
     """Create config from mapping.
 
+    Values are converted to the annotated types where possible (e.g. `str` to
+    `Path`); values of `Literal` fields are checked.
+
     :param dict overrides: Overwrite specified fields.
+    :raises: RequiredFieldMissing, InvalidFieldValue
     """
+    try:
+        loader = get_schema(cls).loader
+    except TypeError:
+        # not a dataclass, pass fields as they are
+        return cls(**{**data, **(overwrite or {})})
 
-    fields = {**data}
-
-    if overwrite:
-        fields.update(overwrite)
-
-    check_required_fields(cls, fields)
-
-    return cls(**fields)
+    return loader(data, overwrite)
 
 
 def from_file(cls, path: PathLike, overwrite: Optional[Mapping] = None):
@@ -180,33 +154,296 @@ def from_file(cls, path: PathLike, overwrite: Optional[Mapping] = None):
     return from_dict(cls, data, overwrite=overwrite)
 
 
-def add_click_options(func: Callable, config_cls: Type, name: str) -> Callable:
+def watch(
+    cls,
+    path: PathLike,
+    callback: Callable[[Any, Changes], None],
+    overwrite: Optional[Mapping] = None,
+    *,
+    interval: float = 1.0,
+    debounce: float = 0.2,
+) -> ConfigWatcher:
+    """Load config from file and rebuild it whenever the file changes.
+
+    The callback receives the new config and the changed fields (mapping each
+    name to the old and new value). The current config is available as the
+    `config` attribute of the returned (started) watcher; call its `stop`
+    method (or use it as a context manager) to stop watching.
+
+    :param dict overrides: Overwrite specified fields.
+    :param float interval: Time (in seconds) between two checks of the file.
+    :param float debounce: Time (in seconds) the file needs to remain
+        unchanged before it is reloaded.
+    """
+    watcher = ConfigWatcher(
+        path,
+        lambda data: from_dict(cls, data, overwrite=overwrite),
+        callback,
+        interval=interval,
+        debounce=debounce,
+    )
+    return watcher.start()
+
+
+class InvalidRecord(ValueError):
+    def __init__(self, location, reason):
+        text = f"Invalid record ({location}): {reason}"
+        super().__init__(text)
+        self.location = location
+        self.message = text
+
+
+def _load_records(
+    cls,
+    records: Iterable[Tuple[str, Any]],
+    overwrite: Optional[Mapping],
+    skip_invalid: bool,
+    parse: Optional[Callable[[Any], Any]] = None,
+) -> Iterator[Any]:
+    """Create a config for each (parsed) record, given with its location."""
+    try:
+        loader = get_schema(cls).loader
+    except TypeError:
+        # not a dataclass
+        def loader(data, overwrite):
+            return from_dict(cls, data, overwrite=overwrite)
+
+    for location, record in records:
+        try:
+            if parse is not None:
+                record = parse(record)
+
+            if not isinstance(record, Mapping):
+                raise TypeError(f"Expected a mapping, got {record!r}.")
+
+            config = loader(record, overwrite)
+        except (TypeError, ValueError, RequiredFieldMissing) as exc:
+            if skip_invalid:
+                logging.warning(
+                    "Skipping invalid record (%s): %s", location, exc
+                )
+                continue
+            raise InvalidRecord(location, exc) from exc
+
+        yield config
+
+
+def from_records(
+    cls,
+    records: Iterable[Mapping],
+    overwrite: Optional[Mapping] = None,
+    *,
+    lazy: bool = False,
+    skip_invalid: bool = False,
+):
+    """Create a config from each mapping.
+
+    :param dict overrides: Overwrite specified fields (in all configs).
+    :param bool lazy: Return an iterator instead of a list.
+    :param bool skip_invalid: Log and skip invalid records instead of raising.
+    :raises: InvalidRecord
+    """
+    configs = _load_records(
+        cls,
+        ((f"record #{i}", record) for i, record in enumerate(records)),
+        overwrite,
+        skip_invalid,
+    )
+
+    return configs if lazy else list(configs)
+
+
+def from_jsonl(
+    cls,
+    path: PathLike,
+    overwrite: Optional[Mapping] = None,
+    *,
+    lazy: bool = False,
+    skip_invalid: bool = False,
+):
+    """Create a config from each line of a JSON Lines file.
+
+    The file is read line by line, hence (with `lazy=True`) memory usage does
+    not depend on the size of the file. Blank lines are ignored.
+
+    :param dict overrides: Overwrite specified fields (in all configs).
+    :param bool lazy: Return an iterator instead of a list.
+    :param bool skip_invalid: Log and skip invalid lines instead of raising.
+    :raises: InvalidRecord
+    """
+    import json
+
+    def lines():
+        with open(path, "r", encoding="utf-8") as jsonl_file:
+            for line_number, line in enumerate(jsonl_file, start=1):
+                if line.strip():
+                    yield f"line {line_number}", line
+
+    configs = _load_records(
+        cls, lines(), overwrite, skip_invalid, parse=json.loads
+    )
+
+    return configs if lazy else list(configs)
+
+
+def drop_duplicate_runs(
+    points: Iterable[Tuple[int, Dict[str, Any]]],
+    build: Callable[[Dict[str, Any], int], Any],
+    on_skip: Optional[Callable[[int], None]] = None,
+) -> Iterator[Tuple[int, Dict[str, Any], Any]]:
+    """Filter out points whose configs equal the config of a previous point.
+
+    Configs are compared by their fingerprint, hence the fingerprint of each
+    distinct config is kept in memory. The built configs are passed on along
+    with the points, so they do not need to be built again.
+
+    :param build: Function creating the config of a point (given the point and
+        its index).
+    :param on_skip: Function called with the index of each skipped point.
+    """
+    seen = set()
+    duplicates = 0
+
+    for i, point in points:
+        config = build(point, i)
+        key = fingerprint(config)
+
+        if key in seen:
+            duplicates += 1
+
+            if on_skip is not None:
+                on_skip(i)
+        else:
+            seen.add(key)
+            yield i, point, config
+
+    if duplicates > 0:
+        logging.info("Removed %s duplicate __series__ points.", duplicates)
+
+
+def _try_fingerprint(config: Any) -> Optional[str]:
+    """Fingerprint of the config, or None if a value can not be fingerprinted.
+
+    E.g. the value of a `click.File` option.
+    """
+    try:
+        return fingerprint(config)
+    except TypeError:
+        return None
+
+
+def _check_option_names(
+    schema: ConfigSchema, params: Sequence[click.Parameter]
+):
+    """Raise if an option of a field collides with another added option.
+
+    Click would only warn about the collision, and one of the options would
+    not be reachable.
+    """
+    field_opts = {}
+
+    for option in schema.options:
+        *decls, field_name = option.param_decls
+
+        for decl in decls:
+            for opt in decl.split("/"):
+                field_opts[opt.strip()] = field_name
+
+    for param in params:
+        if param.name in schema.field_names:
+            continue
+
+        for opt in (*param.opts, *param.secondary_opts):
+            if opt in field_opts:
+                raise TypeError(
+                    f"Option {opt} of field '{field_opts[opt]}' collides "
+                    f"with the option of the same name added by "
+                    "click_config (declare a different option name for the "
+                    'field, e.g. using `field("--other-name")`).'
+                )
+
+
+def add_click_options(
+    func: Callable,
+    config_cls: Type,
+    name: str,
+    jobs: int = 1,
+    validate_series: bool = False,
+    manifest: Optional[PathLike] = None,
+    skip_duplicates: bool = False,
+    constraints: Sequence[Constraint] = (),
+    cache_dir: Optional[PathLike] = None,
+    cache_max_bytes: Optional[int] = None,
+    cache_max_age: Optional[float] = None,
+    durations: Optional[PathLike] = None,
+    concurrency: int = 1,
+    isolate: bool = False,
+    preload: Sequence[str] = (),
+    observer: Optional[Observer] = None,
+    profile: bool = False,
+) -> Callable:
     """Add options to a click command based on a dataclass.
 
     :param Callable func: Function (cli command) to decorate.
     :param Type config_cls: Configuration class. Must be a dataclass.
     :param str name: Name of the argument the resulting config object is passed
         as (as well as the resulting cli option).
+    :param int jobs: Default number of processes used for running a series
+        (can be changed via `--jobs`).
+    :param bool validate_series: Build each config of a series once before
+        the first run starts (configs are not kept in memory).
+    :param PathLike manifest: File completed runs are recorded in (by
+        default `<config file>.<function name>.manifest`). If set, runs are
+        resumed by default (can be changed via `--resume`).
+    :param bool skip_duplicates: Skip points of a series whose config equals
+        the config of a previous point by default (can be changed via
+        `--skip-duplicates`). Each config is then built in this process (also
+        for parallel runs), and the fingerprint of each distinct config is
+        kept in memory.
+    :param constraints: Predicates which each point of a series needs to
+        fulfill (receive a mapping of all values set for the point).
+    :param PathLike cache_dir: Directory the results of runs are stored in.
+        Runs whose config has been run before are skipped (can be changed via
+        `--cache`).
+    :param int cache_max_bytes: Maximum total size of the cached results.
+    :param float cache_max_age: Maximum time (in seconds) since a cached
+        result has last been used.
+    :param PathLike durations: File the durations of runs are recorded in.
+        Parallel runs (and points claimed from a queue) are scheduled by
+        decreasing estimated duration.
+    :param int concurrency: Default number of points of a series which are
+        run concurrently if `func` is a coroutine function (can be changed via
+        `--concurrency`).
+    :param bool isolate: Run each point of a series in a forked child process
+        by default (can be changed via `--isolate`).
+    :param preload: Names of modules which are imported once before the
+        processes of the runs are forked.
+    :param observer: Function which receives an `Event` with the timing of
+        each phase (reading the file, expanding the series, building each
+        config and each run).
+    :param bool profile: Add options for profiling each run (`--profile`).
     :returns: Callable -- the decorated function.
-    :raises: TypeError
+    :raises: TypeError -- e.g. if an option of a field collides with one of
+        the options added for running series.
     """
-    if config_cls.__doc__ is not None:
-        # parse doc text, to generate help text for fields
-        param_doc = {}
-
-        for param in parse_docstring(config_cls.__doc__).params:
-            param_doc[param.arg_name] = param.description
+    schema = get_schema(config_cls)
 
-    for _field in fields(config_cls):
-        assert isinstance(_field, Field)
+    # options which are already attached (by other decorators)
+    n_params = len(getattr(func, "__click_params__", ()))
 
-        attrs = get_attrs(_field)
-        param_decls = get_param_decls(_field)
+    for option in schema.options:
+        attrs = dict(option.attrs)
 
-        if "help" not in attrs and _field.name in param_doc:
-            attrs["help"] = param_doc[_field.name]
+        if "help" not in attrs:
+            # help text is retrieved from docstring once it is rendered
+            attrs["cls"] = (
+                lazy_help_option(attrs["cls"])
+                if "cls" in attrs
+                else ConfigOption
+            )
+            attrs["config_cls"] = config_cls
 
-        func = click.option(*param_decls, **attrs)(func)
+        func = click.option(*option.param_decls, **attrs)(func)
 
     # add option for reading values from a file
     func = click.option(
@@ -217,12 +454,198 @@ def add_click_options(func: Callable, config_cls: Type, name: str) -> Callable:
         ),
     )(func)
 
+    # add option for running series in parallel
+    func = click.option(
+        "--jobs",
+        "_jobs",
+        default=jobs,
+        show_default=True,
+        type=click.IntRange(min=0),
+        help="Number of processes used to run a __series__ (0: one per CPU).",
+    )(func)
+
+    # add options for accessing single points of a series
+    func = click.option(
+        "--series-index",
+        "_series_index",
+        default=None,
+        type=click.IntRange(min=0),
+        help="Only run the point with this index of the __series__.",
+    )(func)
+
+    func = click.option(
+        "--series-count",
+        "_series_count",
+        is_flag=True,
+        help="Print the number of points in the __series__ and exit.",
+    )(func)
+
+    # add options for splitting a series across multiple processes / nodes
+    func = click.option(
+        "--shard",
+        "_shard",
+        default=None,
+        type=ShardParamType(),
+        help="Only run the i-th of n disjoint parts of the __series__.",
+    )(func)
+
+    func = click.option(
+        "--shard-mode",
+        "_shard_mode",
+        default="contiguous",
+        show_default=True,
+        type=click.Choice(["contiguous", "strided"]),
+        help="Split the __series__ into blocks or take every n-th point.",
+    )(func)
+
+    # add option for skipping runs which have been completed before
+    func = click.option(
+        "--resume/--no-resume",
+        "_resume",
+        default=manifest is not None,
+        show_default=True,
+        help=(
+            "Record completed runs in a manifest and skip them when the "
+            "__series__ is run again."
+        ),
+    )(func)
+
+    # add option for skipping points whose config has been seen before
+    func = click.option(
+        "--skip-duplicates/--no-skip-duplicates",
+        "_skip_duplicates",
+        default=skip_duplicates,
+        show_default=True,
+        help=(
+            "Skip __series__ points whose config equals the config of a "
+            "previous point (keeps a fingerprint per point in memory)."
+        ),
+    )(func)
+
+    # add options for claiming points from a queue shared by many workers
+    func = click.option(
+        "--queue",
+        "_queue",
+        default=None,
+        type=click.Path(file_okay=False, dir_okay=True, writable=True),
+        help="Claim points of the __series__ from a queue in this directory.",
+    )(func)
+
+    func = click.option(
+        "--queue-timeout",
+        "_queue_timeout",
+        default=600.0,
+        show_default=True,
+        type=click.FloatRange(min=0, min_open=True),
+        help="Seconds after which claims of unresponsive workers expire.",
+    )(func)
+
+    func = click.option(
+        "--queue-status",
+        "_queue_status",
+        is_flag=True,
+        help="Print the number of pending, running, done and failed points.",
+    )(func)
+
+    duration_log = None if durations is None else DurationLog(durations)
+
+    def observe(phase, start, index=None, config=None, error=None, **info):
+        assert observer is not None
+        observer(
+            Event(
+                phase,
+                time.perf_counter() - start,
+                index,
+                None if config is None else _try_fingerprint(config),
+                error,
+                info,
+            )
+        )
+
+    # add option for running each point in a separate process
+    func = click.option(
+        "--isolate/--no-isolate",
+        "_isolate",
+        default=isolate,
+        show_default=True,
+        help="Run each point of the __series__ in a forked child process.",
+    )(func)
+
+    if profile:
+        # add options for profiling each run
+        func = click.option(
+            "--profile",
+            "_profile",
+            default=None,
+            type=click.Path(file_okay=False, dir_okay=True, writable=True),
+            help="Write a profile of each run (and a merged one) to a new "
+            "sub-directory of this directory.",
+        )(func)
+
+        func = click.option(
+            "--profile-mode",
+            "_profile_mode",
+            default="cpu",
+            show_default=True,
+            type=click.Choice(["cpu", "memory", "all"]),
+            help="Profile with cProfile (cpu), tracemalloc (memory) or both.",
+        )(func)
+
+    is_coroutine = inspect.iscoroutinefunction(func)
+
+    if is_coroutine:
+        # add option for running points of a series concurrently
+        func = click.option(
+            "--concurrency",
+            "_concurrency",
+            default=concurrency,
+            show_default=True,
+            type=click.IntRange(min=1),
+            help="Number of __series__ points run concurrently.",
+        )(func)
+
+    run_cache: Optional[RunCache] = None
+
+    # results of other commands (sharing the directory) must not be used
+    command_name = f"{func.__module__}.{func.__qualname__}"
+
+    if cache_dir is not None:
+        run_cache = RunCache(cache_dir, cache_max_bytes, cache_max_age)
+
+        # add option for running commands again despite a cached result
+        func = click.option(
+            "--cache/--no-cache",
+            "_cache",
+            default=True,
+            show_default=True,
+            help="Skip runs whose result has been cached before.",
+        )(func)
+
+    params = getattr(func, "__click_params__")
+    _check_option_names(schema, params[n_params:])
+
     @wraps(func)
     def wrapped_func(**kw):
+        n_jobs = kw.pop("_jobs", 1) or os.cpu_count() or 1
+        series_index = kw.pop("_series_index", None)
+        series_count = kw.pop("_series_count", False)
+        shard = kw.pop("_shard", None)
+        shard_mode = kw.pop("_shard_mode", "contiguous")
+        resume = kw.pop("_resume", False)
+        dedupe = kw.pop("_skip_duplicates", False)
+        cache = run_cache if kw.pop("_cache", False) else None
+        concurrency = kw.pop("_concurrency", 1)
+        isolate = kw.pop("_isolate", False)
+        profile_dir = kw.pop("_profile", None)
+        profile_mode = kw.pop("_profile_mode", "cpu")
+        queue_dir = kw.pop("_queue", None)
+        queue_timeout = kw.pop("_queue_timeout", 600.0)
+        queue_status = kw.pop("_queue_status", False)
+
         cli_kw = {}
 
-        for _field in fields(config_cls):
-            value = kw.pop(_field.name, None)
+        for field_name in schema.field_names:
+            value = kw.pop(field_name, None)
 
             if value is None:
                 # cli option was not used
@@ -235,69 +658,524 @@ def add_click_options(func: Callable, config_cls: Type, name: str) -> Callable:
             except TypeError:
                 pass
 
-            cli_kw[_field.name] = value
+            cli_kw[field_name] = value
 
         # get path to config file
         conf_path = kw.pop(name, None)
 
-        configurations = []
+        if cache is not None:
+            # remaining options are part of the key of cached results
+            for option_name, value in kw.items():
+                try:
+                    canonicalize(value)
+                except TypeError as exc:
+                    raise click.UsageError(
+                        f"The value of '{option_name}' can not be part of the "
+                        f"key of a cached result ({exc}). Use --no-cache."
+                    ) from exc
+
+        start = time.perf_counter()
+
+        if conf_path is None:
+            # create config directly from cli options
+            series = Series({}, {})
+        else:
+            # load config from file and overwrite values given via cli options
+            data = read_config_file(conf_path)
+
+            if observer is not None:
+                observe("read", start, path=str(conf_path))
+                start = time.perf_counter()
+
+            try:
+                series = Series(
+                    data,
+                    data.pop("__series__", {}),
+                    overwrite=cli_kw,
+                    constraints=constraints,
+                    defaults=schema.defaults,
+                )
+            except ValueError as exc:
+                raise click.UsageError(str(exc)) from exc
+
+            # axes overwritten by cli options would only produce duplicates
+            n_removed = series.nominal_size - series.grid_size
+
+            if n_removed > 0:
+                logging.info(
+                    "Removed %s duplicate __series__ points (overwritten "
+                    "axes or repeated values).",
+                    n_removed,
+                )
+
+            if series.samples is not None:
+                logging.info(
+                    "Sampled %s of %s __series__ points.",
+                    len(series),
+                    series.grid_size,
+                )
+            elif series.filtered:
+                logging.info(
+                    "Excluded %s __series__ points.",
+                    series.grid_size - len(series),
+                )
+
+        count = len(series)
+
+        if observer is not None:
+            observe("expand", start, points=count)
+
+        if series_count:
+            click.echo(count)
+            return
+
+        indices: Optional[Sequence[int]] = None
+
+        if series_index is not None and shard is not None:
+            raise click.UsageError(
+                "--series-index and --shard are mutually exclusive."
+            )
+
+        work_queue: Optional[WorkQueue] = None
+
+        if queue_dir is not None:
+            if series_index is not None or shard is not None:
+                raise click.UsageError(
+                    "--queue can not be combined with --series-index or "
+                    "--shard."
+                )
+
+            try:
+                work_queue = WorkQueue(queue_dir, count, queue_timeout)
+            except ValueError as exc:
+                raise click.UsageError(str(exc)) from exc
+
+            if queue_status:
+                for state, n_points in work_queue.status().items():
+                    click.echo(f"{state}: {n_points}")
+                return
+
+        elif queue_status:
+            raise click.UsageError("--queue-status requires --queue.")
+
+        if shard is not None:
+            shard_index, n_shards = shard
+            indices = series.shard(
+                shard_index, n_shards, strided=shard_mode == "strided"
+            )
+
+        if series_index is not None:
+            if series_index >= count:
+                raise click.BadParameter(
+                    f"{series_index} is out of range for a __series__ with "
+                    f"{count} points.",
+                    param_hint="'--series-index'",
+                )
+            indices = [series_index]
 
         try:
-            if conf_path is None:
-                # check if all required fields were set
-                check_required_fields(config_cls, cli_kw)
+            # all points of a series set the same fields: check them only once
+            check_required_fields(
+                config_cls, {**dict.fromkeys(series.fields), **cli_kw}
+            )
+        except RequiredFieldMissing as exc:
+            raise click.UsageError(exc.message)
 
-                # create config directly from cli options
-                configurations.append(config_cls(**cli_kw))
+        if validate_series:
+            # build (and discard) each config before the first run starts
+            for i, point in series.points(indices):
+                try:
+                    from_dict(config_cls, point, overwrite=cli_kw)
+                except Exception as exc:
+                    raise click.UsageError(
+                        f"Invalid __series__ configuration #{i}: {exc}"
+                    ) from exc
+
+        completed_runs: Optional[Manifest] = None
+        completed: AbstractSet[str] = frozenset()
+
+        if resume:
+            if manifest is not None:
+                completed_runs = Manifest(manifest)
+            elif conf_path is not None:
+                # per command: e.g. `train` and `evaluate` may share a file
+                completed_runs = Manifest(
+                    f"{conf_path}.{func.__name__}.manifest"
+                )
             else:
-                # load config from file and overwrite values given via cli options
-                data = read_config_file(conf_path)
+                raise click.UsageError(
+                    "--resume requires a config file or a manifest."
+                )
 
-                if "__series__" in data:
-                    series = data.pop("__series__")
-                    keys = series.keys()
+            completed = completed_runs.read()
 
-                    for experiment in product(*series.values()):
-                        exp_data = dict(zip(keys, experiment))
+        def build(point, index=None):
+            if observer is None:
+                try:
+                    return from_dict(config_cls, point, overwrite=cli_kw)
+                except (RequiredFieldMissing, InvalidFieldValue) as exc:
+                    raise click.UsageError(exc.message)
 
-                        configurations.append(
-                            from_dict(
-                                config_cls,
-                                {**data, **exp_data},
-                                overwrite=cli_kw,
-                            )
-                        )
+            start = time.perf_counter()
 
-                else:
-                    configurations.append(
-                        from_dict(config_cls, data, overwrite=cli_kw)
-                    )
-        except RequiredFieldMissing as exc:
-            raise click.UsageError(exc.message)
+            try:
+                config = from_dict(config_cls, point, overwrite=cli_kw)
+            except (RequiredFieldMissing, InvalidFieldValue) as exc:
+                observe("build", start, index, error=repr(exc))
+                raise click.UsageError(exc.message)
+
+            observe("build", start, index, config)
+            return config
+
+        def prepare(index, point, config):
+            """Return the kw args of a run (None if its result is cached)."""
+            if config is None:
+                config = build(point, index)
 
-        for i, config in enumerate(configurations):
-            if len(configurations) > 1:
-                logging.info("__series__ run #%s/%s", i, len(configurations))
+            if completed and fingerprint(config) in completed:
+                logging.info("Skipped completed __series__ run #%s.", index)
+                return None
+
+            if (
+                dedupe
+                and work_queue is not None
+                and not work_queue.claim_config(fingerprint(config), index)
+            ):
+                # duplicates are detected among the points claimed from the
+                # queue (by any worker), once they are claimed
+                logging.info("Skipped duplicate __series__ point #%s.", index)
+                return None
 
             # add config object to the kw args passed to the decorated funcion
             func_kw = dict(kw)
             func_kw[name] = config
-            func(**func_kw)
+
+            if cache is not None:
+                key = run_key(config, kw, command_name)
+                cached, _ = cache.get(key)
+
+                if cached:
+                    logging.info("Skipped run with cached result (%s).", key)
+                    complete(index, point, config)
+                    return None
+
+            return func_kw
+
+        def complete(index, point, config, start=None, result=None):
+            if start is not None:
+                if observer is not None:
+                    observe("run", start, index, config)
+
+                if duration_log is not None:
+                    duration_log.add(
+                        fingerprint(config), point, time.perf_counter() - start
+                    )
+
+                if cache is not None:
+                    cache.put(run_key(config, kw, command_name), result)
+
+            if completed_runs is not None:
+                completed_runs.add(fingerprint(config))
+
+        def call(func_kw):
+            result = func(**func_kw)
+
+            if is_coroutine:
+                import asyncio
+
+                result = asyncio.run(result)
+
+            return result
+
+        def run(index, point, config=None):
+            func_kw = prepare(index, point, config)
+
+            if func_kw is None:
+                return
+
+            start = time.perf_counter()
+
+            try:
+                if profile_dir is None:
+                    result = call(func_kw)
+                else:
+                    profile_name = f"run-{index}"
+                    key = _try_fingerprint(func_kw[name])
+
+                    if key is not None:
+                        profile_name += f"-{key[:12]}"
+
+                    with profiled(
+                        profile_dir,
+                        profile_name,
+                        cpu=profile_mode in ("cpu", "all"),
+                        memory=profile_mode in ("memory", "all"),
+                    ):
+                        result = call(func_kw)
+            except BaseException as exc:
+                if observer is not None:
+                    observe("run", start, index, func_kw[name], repr(exc))
+                raise
+
+            complete(index, point, func_kw[name], start, result)
+
+        async def run_async(index, point, config=None):
+            func_kw = prepare(index, point, config)
+
+            if func_kw is None:
+                return
+
+            start = time.perf_counter()
+
+            try:
+                result = await func(**func_kw)
+            except BaseException as exc:
+                if observer is not None:
+                    observe("run", start, index, func_kw[name], repr(exc))
+                raise
+
+            complete(index, point, func_kw[name], start, result)
+
+        # tasks: index, point and (if already built) config
+        tasks: Iterator[Tuple[int, Dict[str, Any], Any]]
+
+        if dedupe and count > 1 and work_queue is None:
+            tasks = drop_duplicate_runs(series.points(indices), build)
+        else:
+            tasks = ((i, point, None) for i, point in series.points(indices))
+
+        n_runs = count if indices is None else len(indices)
+
+        if isolate and not isolation_available():
+            logging.warning(
+                "Isolated runs require os.fork, running in this process."
+            )
+            isolate = False
+
+        if isolate or (n_jobs > 1 and n_runs > 1):
+            # import once, before the processes of the runs are forked
+            for module_name in preload:
+                import_module(module_name)
+
+        if isolate:
+            # every run is executed in a fresh child of this process
+            run = isolated(run)
+
+        if (
+            duration_log is not None
+            and (n_jobs > 1 or concurrency > 1 or work_queue is not None)
+            and n_runs > 1
+        ):
+            cost_model = CostModel(duration_log.read(), series.keys)
+
+            if cost_model:
+                # start the longest runs first to reduce the total time (the
+                # configs are not built for this: workers of a queue only
+                # build the configs of the points they claim), only the values
+                # of the varied fields are kept for each point
+                keys = series.keys
+                compact = [
+                    (i, tuple(point[key] for key in keys), config)
+                    for i, point, config in tasks
+                ]
+                order = cost_model.longest_first(
+                    (
+                        i,
+                        dict(zip(keys, values)),
+                        None if config is None else _try_fingerprint(config),
+                    )
+                    for i, values, config in compact
+                )
+                tasks = (
+                    (i, {**series.data, **dict(zip(keys, values))}, config)
+                    for i, values, config in (compact[pos] for pos in order)
+                )
+
+        def execute(tasks) -> List[RunResult]:
+            """Run the tasks, return the results of the failed runs."""
+            if work_queue is not None:
+                if n_jobs > 1:
+                    logging.warning(
+                        "--jobs is ignored in queue mode, start further "
+                        "workers instead."
+                    )
+
+                return work_on_queue(
+                    work_queue, run, tasks, series.__getitem__
+                )
+
+            if (
+                is_coroutine
+                and concurrency > 1
+                and n_runs > 1
+                and not isolate
+                and profile_dir is None
+            ):
+                import asyncio
+
+                return asyncio.run(
+                    run_concurrently(
+                        lambda item: run_async(*item),
+                        ((i, (i, point, c)) for i, point, c in tasks),
+                        count,
+                        concurrency,
+                    )
+                )
+
+            if n_jobs > 1 and n_runs > 1:
+                if fork_available():
+                    # configs are built again in the workers
+                    return run_parallel(
+                        lambda item: run(*item),
+                        ((i, (i, point)) for i, point, _ in tasks),
+                        count,
+                        n_jobs,
+                    )
+
+                logging.warning(
+                    "Parallel runs require the 'fork' start method, "
+                    "running __series__ sequentially."
+                )
+
+            failed = []
+
+            for i, point, config in tasks:
+                if count > 1:
+                    logging.info("__series__ run #%s/%s", i, count)
+
+                if isolate:
+                    # failures of isolated runs do not stop the series
+                    result = call_and_report(i, lambda: run(i, point, config))
+
+                    if result.failed:
+                        failed.append(result)
+                else:
+                    run(i, point, config)
+
+            return failed
+
+        if cache is not None:
+            cache.prune()
+
+        if profile_dir is not None:
+            # a directory per invocation: profiles of other invocations (e.g.
+            # concurrent shards) are not merged with the ones of this one
+            profile_dir = make_profile_directory(profile_dir)
+            logging.info("Writing profiles to %s.", profile_dir)
+
+        try:
+            failed = execute(tasks)
+        finally:
+            if cache is not None:
+                cache.prune()
+
+            if profile_dir is not None:
+                merged = merge_profiles(profile_dir)
+
+                if merged is not None:
+                    logging.info("Wrote merged profile to %s.", merged)
+
+        if failed:
+            raise SeriesFailed(failed, n_runs)
 
     return wrapped_func
 
 
 def click_config_options(
-    cls: Type, func: Optional[Callable] = None, *, name: str = "config"
+    cls: Type,
+    func: Optional[Callable] = None,
+    *,
+    name: str = "config",
+    jobs: int = 1,
+    validate_series: bool = False,
+    manifest: Optional[PathLike] = None,
+    skip_duplicates: bool = False,
+    constraints: Sequence[Constraint] = (),
+    cache_dir: Optional[PathLike] = None,
+    cache_max_bytes: Optional[int] = None,
+    cache_max_age: Optional[float] = None,
+    durations: Optional[PathLike] = None,
+    concurrency: int = 1,
+    isolate: bool = False,
+    preload: Sequence[str] = (),
+    observer: Optional[Observer] = None,
+    profile: bool = False,
 ) -> Callable:
     """Decorator for attaching options of a class to a click command.
 
     Example: `@click_config_options(Config)`
     Note: Mypy likes using this more than using `@Config.click_options`.
+
+    The runs of a `__series__` can be executed in `jobs` worker processes
+    (overwritable via `--jobs`). In that case, failing runs do not stop the
+    series; instead, a summary of all failures is reported at the end.
+
+    The configurations of a series are built lazily, right before they are
+    run. Set `validate_series` to check all of them upfront.
+
+    With `--resume`, completed runs are recorded in a `manifest` (by default
+    next to the config file) and skipped when the command is run again.
+
+    With `--skip-duplicates` (or `skip_duplicates=True`), points whose config
+    equals the config of a previous point are not run. This requires building
+    each config in the main process and memory for each distinct config.
+
+    Points of a series which do not fulfill all `constraints` (predicates
+    receiving a mapping of the values of a point) are not run.
+
+    With `--queue DIR`, any number of workers (on one or many hosts) claim
+    the points of a series one by one from a queue in a shared directory.
+
+    Coroutine functions (`async def`) are run on an event loop. The points of
+    a series are then run concurrently (at most `concurrency` at once,
+    overwritable via `--concurrency`); on Ctrl-C, all pending runs are
+    cancelled.
+
+    With `--isolate` (or `isolate=True`), each run is executed in a child
+    process forked from the command (after importing the `preload` modules),
+    so state left behind by one run does not affect the next. The exit status
+    and peak memory usage of each run are reported.
+
+    An `observer` receives timing events of the phases of the command (e.g.
+    `LoggingObserver` or `JsonLinesObserver` from `click_config.events`).
+    Note that observers are called in the processes the runs are executed in.
+
+    With `profile=True`, `--profile DIR` writes a cProfile profile
+    (`run-<index>-<fingerprint>.prof`, or `run-<index>.prof` if the config
+    can not be fingerprinted) and/or a report of the top allocation sites
+    (`.alloc.txt`, via tracemalloc) for each run, as well as a profile
+    merged over all runs (`merged.prof`), to a new sub-directory of `DIR`.
+
+    If `durations` is set, the duration of each run is recorded in this file
+    and used to start the (estimated) longest runs of a series first.
+
+    If `cache_dir` is set, the return value of each run is stored under the
+    fingerprint of its config (and the name and remaining arguments of the
+    command), and runs with a stored result are skipped. Results are evicted once they
+    exceed `cache_max_bytes` or have not been used for `cache_max_age`
+    seconds.
     """
 
     def _process_func(func):
-        return add_click_options(func, cls, name)
+        return add_click_options(
+            func,
+            cls,
+            name,
+            jobs=jobs,
+            validate_series=validate_series,
+            manifest=manifest,
+            skip_duplicates=skip_duplicates,
+            constraints=constraints,
+            cache_dir=cache_dir,
+            cache_max_bytes=cache_max_bytes,
+            cache_max_age=cache_max_age,
+            durations=durations,
+            concurrency=concurrency,
+            isolate=isolate,
+            preload=preload,
+            observer=observer,
+            profile=profile,
+        )
 
     if func is None:
         return _process_func
@@ -310,9 +1188,18 @@ class ConfigClass:
     def to_dict(self) -> dict:
         """Represent the fields and values of configuration as a dict."""
         return {
-            _field.name: getattr(self, _field.name) for _field in fields(self)
+            name: getattr(self, name)
+            for name in get_schema(type(self)).field_names
         }
 
+    def fingerprint(self) -> str:
+        """Return a stable hash of the fields and values of the config.
+
+        Identical configs have the same fingerprint, across processes and
+        Python versions. For frozen dataclasses, it is only computed once.
+        """
+        return fingerprint(self)
+
     def to_file(self, path: PathLike):
         """Write config to json, toml, or yaml file."""
         data = self.to_dict()
@@ -320,4 +1207,7 @@ class ConfigClass:
 
     from_dict = classmethod(from_dict)
     from_file = classmethod(from_file)
+    from_records = classmethod(from_records)
+    from_jsonl = classmethod(from_jsonl)
+    watch = classmethod(watch)
     click_options = classmethod(click_config_options)
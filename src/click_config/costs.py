@@ -0,0 +1,184 @@
+"""Recorded run durations and cost estimates for scheduling a series."""
+
+import logging
+import os
+from os import PathLike
+from pathlib import Path
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from .identity import canonicalize
+
+_RECORD_KEYS = {"key", "point", "seconds"}
+
+
+class DurationLog:
+    """Append-only file of the durations of completed runs.
+
+    Each run is recorded as a single json line (written with a single `write`
+    call, hence multiple processes can share one log), which contains the
+    fingerprint of the config, the values of the point and the duration in
+    seconds.
+
+    :param path: Location of the log file.
+    """
+
+    def __init__(self, path: Union[str, PathLike]):
+        self.path = Path(path)
+
+    def add(self, key: str, point: Mapping[str, Any], seconds: float):
+        import json
+
+        line = json.dumps(
+            {
+                "key": key,
+                "point": canonicalize(dict(point)),
+                "seconds": seconds,
+            },
+            sort_keys=True,
+            default=str,
+        )
+
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+        try:
+            os.write(fd, f"{line}\n".encode("utf-8"))
+        finally:
+            os.close(fd)
+
+    def read(self) -> List[Dict[str, Any]]:
+        """Return all (complete) records."""
+        import json
+
+        records = []
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as log_file:
+                for line in log_file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # e.g. interrupted write
+                        continue
+
+                    if isinstance(record, dict) and _RECORD_KEYS <= set(
+                        record
+                    ):
+                        records.append(record)
+        except FileNotFoundError:
+            pass
+
+        return records
+
+
+def _hashable(value: Any) -> Any:
+    """Return a hashable representation of a canonical value."""
+    if isinstance(value, (list, dict)):
+        import json
+
+        return json.dumps(value, sort_keys=True)
+
+    return value
+
+
+class CostModel:
+    """Estimates of the durations of runs based on previous runs.
+
+    Configs which have been run before are estimated by their mean duration.
+    Other points are estimated by the mean over all configs, adjusted (for
+    each of their values) by how much longer or shorter the recorded configs
+    sharing that value took on average.
+
+    :param records: Records of a `DurationLog`.
+    :param keys: Fields which are compared between points (e.g. the varied
+        fields of a series). By default, all recorded fields are compared.
+    """
+
+    def __init__(
+        self,
+        records: Iterable[Mapping[str, Any]],
+        keys: Optional[Iterable[str]] = None,
+    ):
+        durations: Dict[str, List[float]] = {}
+        points: Dict[str, Mapping[str, Any]] = {}
+
+        for record in records:
+            durations.setdefault(record["key"], []).append(record["seconds"])
+            points[record["key"]] = record["point"]
+
+        self._means = {
+            key: sum(seconds) / len(seconds)
+            for key, seconds in durations.items()
+        }
+
+        self.mean = (
+            sum(self._means.values()) / len(self._means) if self._means else 0
+        )
+
+        self.keys = None if keys is None else tuple(keys)
+        compared = None if self.keys is None else set(self.keys)
+
+        # sum and number of the means of the configs sharing each value
+        totals: Dict[Tuple[str, Any], List[float]] = {}
+
+        for key, point in points.items():
+            for name, value in point.items():
+                if compared is None or name in compared:
+                    total = totals.setdefault((name, _hashable(value)), [0, 0])
+                    total[0] += self._means[key]
+                    total[1] += 1
+
+        # deviation from the overall mean per field and value
+        self._effects = {
+            item: total / count - self.mean
+            for item, (total, count) in totals.items()
+        }
+
+    def __bool__(self) -> bool:
+        return bool(self._means)
+
+    def estimate(self, key: Optional[str], point: Mapping[str, Any]) -> float:
+        """Return the estimated duration (in seconds) of a run.
+
+        :param key: Fingerprint of the config (None if it is unknown, e.g.
+            since the config has not been built yet).
+        """
+        if key is not None and key in self._means:
+            return self._means[key]
+
+        estimate = self.mean
+
+        for name in point if self.keys is None else self.keys:
+            if name in point:
+                value = _hashable(canonicalize(point[name]))
+                estimate += self._effects.get((name, value), 0)
+
+        return max(estimate, 0)
+
+    def longest_first(
+        self, tasks: Iterable[Tuple[int, Mapping[str, Any], Optional[str]]]
+    ) -> List[int]:
+        """Return the positions of the tasks ordered by decreasing cost.
+
+        :param tasks: Index, point and config fingerprint (or None) of each
+            run. Only the estimated costs are kept.
+        """
+        costs = [self.estimate(key, point) for _, point, key in tasks]
+
+        logging.info(
+            "Scheduling %s __series__ runs longest first (estimated total: "
+            "%.1fs).",
+            len(costs),
+            sum(costs),
+        )
+
+        # stable: ties keep the order of the series
+        return sorted(range(len(costs)), key=lambda pos: -costs[pos])
@@ -0,0 +1,96 @@
+"""Timing events of the phases of a (series of) run(s), and observers."""
+
+import logging
+import os
+from dataclasses import asdict, dataclass, field
+from os import PathLike
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Union
+
+
+@dataclass
+class Event:
+    """Timing of a phase of a command.
+
+    Phases are `read` (reading and parsing the config file), `expand`
+    (creating and counting the points of the series), `build` (creating the
+    config of a point) and `run` (calling the command with a config).
+
+    :param phase: Name of the phase.
+    :param seconds: Wall-clock duration of the phase.
+    :param index: Index of the point in the series (`build` and `run`).
+    :param fingerprint: Fingerprint of the config (`build` and `run`, None
+        if a value of the config can not be fingerprinted).
+    :param error: Representation of the exception raised in the phase.
+    :param info: Further details (e.g. the path of the config file).
+    """
+
+    phase: str
+    seconds: float
+    index: Optional[int] = None
+    fingerprint: Optional[str] = None
+    error: Optional[str] = None
+    info: Dict[str, Any] = field(default_factory=dict)
+
+
+Observer = Callable[[Event], None]
+
+
+class LoggingObserver:
+    """Emit events as log records.
+
+    The event is attached to each record (as a dict in `record.event`), so
+    handlers and formatters can process it as structured data.
+
+    :param logger: Logger (or name of the logger) the records are emitted to.
+    :param level: Level of the records.
+    """
+
+    def __init__(
+        self,
+        logger: Union[str, logging.Logger] = "click_config.events",
+        level: int = logging.DEBUG,
+    ):
+        if isinstance(logger, str):
+            logger = logging.getLogger(logger)
+
+        self.logger = logger
+        self.level = level
+
+    def __call__(self, event: Event):
+        if not self.logger.isEnabledFor(self.level):
+            return
+
+        self.logger.log(
+            self.level,
+            "%s%s took %.6fs%s",
+            event.phase,
+            "" if event.index is None else f" #{event.index}",
+            event.seconds,
+            "" if event.error is None else f" (failed: {event.error})",
+            extra={"event": asdict(event)},
+        )
+
+
+class JsonLinesObserver:
+    """Append events as json lines to a file.
+
+    Each event is written with a single `write` call, hence multiple
+    processes (e.g. parallel runs) can share one file.
+
+    :param path: Location of the file.
+    """
+
+    def __init__(self, path: Union[str, PathLike]):
+        self.path = Path(path)
+
+    def __call__(self, event: Event):
+        import json
+
+        line = json.dumps(asdict(event), default=str)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+        try:
+            os.write(fd, f"{line}\n".encode("utf-8"))
+        finally:
+            os.close(fd)
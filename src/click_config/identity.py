@@ -0,0 +1,126 @@
+"""Stable identity (fingerprint) of configurations."""
+
+import dataclasses
+from collections.abc import Mapping
+from datetime import date, time
+from enum import Enum
+from pathlib import PurePath
+from typing import Any
+
+# attribute under which the fingerprints of frozen instances are stored
+_CACHE_ATTRIBUTE = "__click_config_fingerprint__"
+
+
+def canonicalize(value: Any) -> Any:
+    """Return a canonical, json serializable representation of a value.
+
+    Tuples and lists are both represented as lists, sets are sorted, paths are
+    represented by their posix string and dataclasses by a mapping of their
+    fields. Mappings with keys other than strings become sorted lists of key
+    value pairs. Dates and times (e.g. parsed from yaml or toml files) are
+    represented by their ISO format, bytes by their hex string.
+
+    Other types can define a `__fingerprint__` method, which returns a
+    (canonicalizable) representation of the value.
+
+    :raises: TypeError -- if a value of any other type is encountered (its
+        string could contain e.g. a memory address, which is not stable).
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+
+    hook = getattr(type(value), "__fingerprint__", None)
+
+    if hook is not None:
+        return canonicalize(hook(value))
+
+    if isinstance(value, Enum):
+        return canonicalize(value.value)
+
+    if isinstance(value, PurePath):
+        return {"__path__": value.as_posix()}
+
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return {
+            _field.name: canonicalize(getattr(value, _field.name))
+            for _field in dataclasses.fields(value)
+        }
+
+    if isinstance(value, Mapping):
+        if all(isinstance(key, str) for key in value):
+            return {key: canonicalize(item) for key, item in value.items()}
+
+        return {
+            "__items__": sorted(
+                (
+                    [canonicalize(key), canonicalize(item)]
+                    for key, item in value.items()
+                ),
+                key=_encode,
+            )
+        }
+
+    if isinstance(value, (list, tuple)):
+        return [canonicalize(item) for item in value]
+
+    if isinstance(value, (set, frozenset)):
+        return {
+            "__set__": sorted(
+                (canonicalize(item) for item in value), key=_encode
+            )
+        }
+
+    if isinstance(value, (date, time)):
+        # datetime is a subclass of date
+        return {"__datetime__": value.isoformat()}
+
+    if isinstance(value, (bytes, bytearray)):
+        return {"__bytes__": bytes(value).hex()}
+
+    raise TypeError(
+        f"Can not fingerprint values of type {type(value).__qualname__} "
+        "(define a __fingerprint__ method returning a canonical "
+        "representation)."
+    )
+
+
+def _encode(value: Any) -> str:
+    import json
+
+    # floats are encoded by their shortest repr (identical on all platforms)
+    return json.dumps(
+        value, sort_keys=True, ensure_ascii=True, separators=(",", ":")
+    )
+
+
+def fingerprint(config: Any) -> str:
+    """Return a stable hash of the fields and values of a config.
+
+    The hash (sha256 of the canonical representation, see `canonicalize`) is
+    identical across processes, platforms and Python versions. It is computed
+    only once for instances of frozen dataclasses.
+
+    :param config: Dataclass instance.
+    """
+    cached = getattr(config, _CACHE_ATTRIBUTE, None)
+
+    if cached is not None:
+        return cached
+
+    if not dataclasses.is_dataclass(config) or isinstance(config, type):
+        raise TypeError(f"Expected dataclass instance, got {type(config)}.")
+
+    import hashlib
+
+    encoded = _encode(canonicalize(config)).encode("ascii")
+    key = hashlib.sha256(encoded).hexdigest()
+
+    if config.__dataclass_params__.frozen:  # type: ignore
+        try:
+            # frozen instances only prevent assignment via __setattr__
+            object.__setattr__(config, _CACHE_ATTRIBUTE, key)
+        except AttributeError:
+            # class uses __slots__
+            pass
+
+    return key
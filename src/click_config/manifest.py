@@ -0,0 +1,58 @@
+"""Record of completed runs, used for resuming a series."""
+
+import os
+from os import PathLike
+from pathlib import Path
+from typing import Set, Union
+
+_FINGERPRINT_LENGTH = 64  # length of a hex encoded sha256 digest
+_HEX_DIGITS = set("0123456789abcdef")
+
+
+def _is_fingerprint(key: str) -> bool:
+    return len(key) == _FINGERPRINT_LENGTH and _HEX_DIGITS.issuperset(key)
+
+
+class Manifest:
+    """Append-only file of the fingerprints of completed runs.
+
+    Each completed run is recorded as a single line which is appended with a
+    single `write` call, hence multiple processes can share one manifest.
+    Incomplete lines (e.g. from a killed process) are ignored when reading.
+
+    :param path: Location of the manifest file.
+    """
+
+    def __init__(self, path: Union[str, PathLike]):
+        self.path = Path(path)
+
+    def read(self) -> Set[str]:
+        """Return the fingerprints of all completed runs."""
+        completed = set()
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as manifest_file:
+                for line in manifest_file:
+                    if not line.endswith("\n"):
+                        # last write was interrupted
+                        continue
+
+                    # an interrupted write may prefix the following entry
+                    key = line.strip()[-_FINGERPRINT_LENGTH:]
+
+                    if _is_fingerprint(key):
+                        completed.add(key)
+        except FileNotFoundError:
+            pass
+
+        return completed
+
+    def add(self, key: str):
+        """Record a completed run (and flush it to disk)."""
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+        try:
+            os.write(fd, f"{key}\n".encode("utf-8"))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
@@ -0,0 +1,181 @@
+"""Memoization of the results of runs (keyed by the config fingerprint)."""
+
+import logging
+import os
+from os import PathLike
+from pathlib import Path, PurePath
+from typing import Any, Mapping, Optional, Tuple, Union
+
+from .identity import canonicalize, fingerprint
+
+_SUFFIX = ".pickle"
+
+
+def run_key(
+    config: Any,
+    extra: Optional[Mapping[str, Any]] = None,
+    command: Optional[str] = None,
+) -> str:
+    """Return the key of a run of `config`.
+
+    :param extra: Further arguments the command is called with (e.g. click
+        options which are not part of the config).
+    :param command: Name of the command (e.g. its qualified name), in case
+        several commands share a cache.
+    """
+    key = fingerprint(config)
+
+    if not extra and command is None:
+        return key
+
+    import hashlib
+    import json
+
+    encoded = json.dumps(
+        [key, canonicalize(dict(extra or {})), command],
+        sort_keys=True,
+        ensure_ascii=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(encoded.encode("ascii")).hexdigest()
+
+
+class RunCache:
+    """Directory of results of completed runs.
+
+    Each result is stored (pickled) in a file named by the key of the run.
+    Files are written to a temporary file first and then moved into place,
+    hence concurrent workers (e.g. on a shared file system) never read a
+    partially written result. If a run returns a path (to an artifact), the
+    result is only used as long as the path exists.
+
+    :param directory: Location of the cache.
+    :param max_bytes: Maximum total size of the stored results. Least recently
+        used results are removed first.
+    :param max_age: Maximum time (in seconds) since a result has last been
+        used.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, PathLike],
+        max_bytes: Optional[int] = None,
+        max_age: Optional[float] = None,
+    ):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+    def path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}{_SUFFIX}"
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Return whether a result is stored for the key (and the result)."""
+        import pickle
+        import time
+
+        path = self.path(key)
+
+        try:
+            with open(path, "rb") as result_file:
+                stat = os.fstat(result_file.fileno())
+
+                if (
+                    self.max_age is not None
+                    and time.time() - stat.st_mtime > self.max_age
+                ):
+                    return False, None
+
+                result = pickle.load(result_file)
+        except FileNotFoundError:
+            return False, None
+        except Exception as exc:  # pylint: disable=broad-except
+            logging.warning(
+                "Ignoring unreadable cached result %s: %s", path, exc
+            )
+            return False, None
+
+        if isinstance(result, PurePath) and not os.path.exists(result):
+            # artifact has been removed
+            return False, None
+
+        try:
+            # mark result as recently used
+            os.utime(path)
+        except OSError:
+            pass
+
+        return True, result
+
+    def put(self, key: str, result: Any):
+        """Store the result of a run (atomically)."""
+        import pickle
+        import tempfile
+
+        try:
+            data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as exc:  # pylint: disable=broad-except
+            logging.warning("Result of run can not be cached: %s", exc)
+            return
+
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(
+            dir=path.parent, prefix=f".{key}", suffix=".tmp"
+        )
+
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                tmp_file.write(data)
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def prune(self):
+        """Remove results which exceed the age or size limit."""
+        import time
+
+        if self.max_bytes is None and self.max_age is None:
+            return
+
+        now = time.time()
+        entries = []
+
+        for path in self.directory.glob(f"*/*{_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                # removed by a concurrent process
+                continue
+
+            if self.max_age is not None and now - stat.st_mtime > self.max_age:
+                self._remove(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        if self.max_bytes is None:
+            return
+
+        total = 0
+
+        # keep the most recently used results
+        for _, size, path in sorted(entries, reverse=True):
+            total += size
+
+            if total > self.max_bytes:
+                self._remove(path)
+
+    @staticmethod
+    def _remove(path: Path):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
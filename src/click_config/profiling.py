@@ -0,0 +1,118 @@
+"""Profiling (cProfile and tracemalloc) of the runs of a command."""
+
+from contextlib import contextmanager
+from os import PathLike
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+# number of allocation sites listed in the memory reports
+TOP_ALLOCATIONS = 25
+
+
+@contextmanager
+def profiled(
+    directory: Union[str, PathLike],
+    name: str,
+    cpu: bool = True,
+    memory: bool = False,
+) -> Iterator[None]:
+    """Profile the code executed in the context.
+
+    Writes `<name>.prof` (cProfile stats, if `cpu` is set) and
+    `<name>.alloc.txt` (top allocation sites, if `memory` is set) to the
+    directory.
+    """
+    import cProfile
+    import tracemalloc
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    profiler = cProfile.Profile() if cpu else None
+    trace_memory = memory and not tracemalloc.is_tracing()
+
+    if trace_memory:
+        tracemalloc.start()
+
+    if profiler is not None:
+        profiler.enable()
+
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(directory / f"{name}.prof")
+
+        if trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            write_allocation_report(
+                directory / f"{name}.alloc.txt", snapshot, peak
+            )
+
+
+def write_allocation_report(path: Path, snapshot, peak: int):
+    """Write the top allocation sites (by size) of a tracemalloc snapshot."""
+    snapshot = snapshot.filter_traces(
+        [
+            # allocations of the profiling itself
+            _exclude_filter("<frozen importlib._bootstrap>"),
+            _exclude_filter(__file__),
+        ]
+    )
+    stats = snapshot.statistics("lineno")
+    total = sum(stat.size for stat in stats)
+
+    lines = [
+        f"peak traced memory: {peak / 2**10:.1f} KiB",
+        f"allocated at end of run: {total / 2**10:.1f} KiB",
+        f"top {TOP_ALLOCATIONS} allocation sites:",
+    ]
+    lines += [str(stat) for stat in stats[:TOP_ALLOCATIONS]]
+
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def _exclude_filter(filename: str):
+    import tracemalloc
+
+    return tracemalloc.Filter(False, filename)
+
+
+def make_profile_directory(directory: Union[str, PathLike]) -> Path:
+    """Create a new directory for the profiles of one invocation.
+
+    The name starts with the current time (so directories sort by time) and
+    ends with a random suffix (so concurrent invocations do not collide).
+    """
+    import time
+    import uuid
+
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    path = Path(directory) / name
+    path.mkdir(parents=True)
+    return path
+
+
+def merge_profiles(
+    directory: Union[str, PathLike], name: str = "merged"
+) -> Optional[Path]:
+    """Merge the run profiles in the directory into one file.
+
+    :returns: Optional[Path] -- location of the merged profile (None if no
+        profiles were found).
+    """
+    import pstats
+
+    directory = Path(directory)
+    paths = sorted(str(path) for path in directory.glob("run-*.prof"))
+
+    if not paths:
+        return None
+
+    merged_path = directory / f"{name}.prof"
+    pstats.Stats(*paths).dump_stats(merged_path)
+    return merged_path
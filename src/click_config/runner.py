@@ -0,0 +1,335 @@
+"""Execution of the runs of a (series of) configured command(s)."""
+
+import logging
+import os
+import sys
+import traceback
+from dataclasses import dataclass, replace
+from functools import wraps
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+import click
+
+if TYPE_CHECKING:
+    from asyncio import Task
+    from concurrent.futures import Future
+
+
+@dataclass
+class RunResult:
+    """Outcome of a single run of a decorated command.
+
+    :param index: Position of the run in the series.
+    :param exit_code: Exit status of the run (0 on success).
+    :param error: Formatted exception (or message) if the run failed.
+    :param max_rss: Peak resident set size (in bytes) of the process the run
+        was isolated in.
+    """
+
+    index: int
+    exit_code: int = 0
+    error: Optional[str] = None
+    max_rss: Optional[int] = None
+
+    @property
+    def failed(self) -> bool:
+        return self.exit_code != 0
+
+
+class SeriesFailed(click.ClickException):
+    """Raised after a series finished if at least one of its runs failed.
+
+    :param failed: Results of the failed runs.
+    :param total: Number of runs in the series.
+    """
+
+    def __init__(self, failed: Sequence[RunResult], total: int):
+        self.failed = sorted(failed, key=lambda result: result.index)
+        self.total = total
+
+        lines = [f"{len(self.failed)} of {total} __series__ runs failed:"]
+
+        for result in self.failed:
+            details = f"exit status {result.exit_code}"
+
+            if result.max_rss is not None:
+                details += f", peak RSS {_format_size(result.max_rss)}"
+
+            lines.append(f"run #{result.index} ({details}):")
+
+            if result.error:
+                lines.append(result.error.rstrip())
+
+        super().__init__("\n".join(lines))
+
+
+class IsolatedRunFailed(Exception):
+    """Raised if a run in a child process (see `isolated`) failed.
+
+    :param result: Result reported by the child process.
+    """
+
+    def __init__(self, result: RunResult):
+        super().__init__(result.error or f"exit status {result.exit_code}")
+        self.result = result
+
+
+def _format_size(n_bytes: int) -> str:
+    return f"{n_bytes / 2**20:.1f} MiB"
+
+
+def report_exception(index: int, exc: BaseException) -> RunResult:
+    """Return the result of a run which raised `exc`."""
+    if isinstance(exc, IsolatedRunFailed):
+        return replace(exc.result, index=index)
+
+    if isinstance(exc, click.exceptions.Exit):
+        return RunResult(index, exc.exit_code)
+
+    if isinstance(exc, click.ClickException):
+        return RunResult(index, exc.exit_code, exc.format_message())
+
+    if isinstance(exc, SystemExit):
+        if exc.code is None or isinstance(exc.code, int):
+            return RunResult(index, exc.code or 0)
+        return RunResult(index, 1, str(exc.code))
+
+    error = traceback.format_exception(type(exc), exc, exc.__traceback__)
+    return RunResult(index, 1, "".join(error))
+
+
+def call_and_report(index: int, func: Callable[[], object]) -> RunResult:
+    """Call `func` and capture its exit status instead of raising."""
+    try:
+        func()
+    except (Exception, SystemExit) as exc:  # pylint: disable=broad-except
+        return report_exception(index, exc)
+
+    return RunResult(index)
+
+
+def isolation_available() -> bool:
+    return hasattr(os, "fork")
+
+
+def call_in_child(index: int, func: Callable[[], object]) -> RunResult:
+    """Call `func` in a forked child process and return its result.
+
+    The child inherits the state (e.g. imported modules) of the current
+    process, while any state `func` leaves behind (e.g. leaked memory or
+    modified globals) is discarded with the child. The result includes the
+    peak resident set size of the child.
+    """
+    import pickle
+    import signal
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+
+    if pid == 0:  # pragma: no cover (child process)
+        os.close(read_fd)
+        exit_code = 1
+
+        try:
+            result = call_and_report(index, func)
+            exit_code = result.exit_code
+
+            with os.fdopen(write_fd, "wb") as result_file:
+                pickle.dump(result, result_file)
+        finally:
+            # exit without running cleanup handlers inherited from the parent
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(exit_code)
+
+    os.close(write_fd)
+
+    try:
+        with os.fdopen(read_fd, "rb") as result_file:
+            data = result_file.read()
+
+        _, status, usage = os.wait4(pid, 0)
+    except BaseException:
+        # e.g. KeyboardInterrupt: do not leave the child behind
+        try:
+            os.kill(pid, signal.SIGTERM)
+            os.waitpid(pid, 0)
+        except OSError:
+            pass
+        raise
+
+    if data:
+        result = pickle.loads(data)
+    elif os.WIFSIGNALED(status):
+        signal_name = signal.Signals(os.WTERMSIG(status)).name
+        result = RunResult(index, 1, f"Run was killed by {signal_name}.")
+    else:
+        result = RunResult(index, os.WEXITSTATUS(status) or 1)
+
+    # ru_maxrss is given in kilobytes on linux (and bytes on macos)
+    scale = 1 if sys.platform == "darwin" else 1024
+    result.max_rss = usage.ru_maxrss * scale
+
+    logging.info(
+        "Isolated run finished (exit status %s, peak RSS %s).",
+        result.exit_code,
+        _format_size(result.max_rss),
+    )
+
+    return result
+
+
+def isolated(run: Callable[..., None]) -> Callable[..., None]:
+    """Wrap `run` such that each call happens in a forked child process.
+
+    :raises: IsolatedRunFailed -- if the run failed in the child (the index
+        of its result is set by `report_exception`).
+    """
+
+    @wraps(run)
+    def run_isolated(*args):
+        result = call_in_child(0, lambda: run(*args))
+
+        if result.failed:
+            raise IsolatedRunFailed(result)
+
+    return run_isolated
+
+
+# function executing a run (set in each worker process)
+_worker_run: Optional[Callable[[Any], None]] = None
+
+
+def _init_worker(run: Callable[[Any], None]):
+    global _worker_run
+    _worker_run = run
+
+
+def _run_in_worker(index: int, item: Any) -> RunResult:
+    assert _worker_run is not None
+    run = _worker_run
+    return call_and_report(index, lambda: run(item))
+
+
+def fork_available() -> bool:
+    import multiprocessing
+
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+def run_parallel(
+    run: Callable[[Any], None],
+    items: Iterable[Tuple[int, Any]],
+    count: int,
+    jobs: int,
+) -> List[RunResult]:
+    """Execute `run(item)` for each indexed item in a pool of `jobs` processes.
+
+    The workers are forked, hence `run` (as well as the configuration class
+    and command it refers to) is inherited and does not need to be picklable.
+    Only the items and the results are sent between the processes. Items are
+    consumed lazily: at most two items per worker are pending at any time.
+
+    :returns: List[RunResult] -- results of the failed runs.
+    """
+    # imported here to keep importing click_config cheap
+    import multiprocessing
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    context = multiprocessing.get_context("fork")
+
+    failed = []
+
+    def collect(future):
+        index = pending.pop(future)
+        try:
+            result = future.result()
+        except Exception as exc:  # pylint: disable=broad-except
+            # e.g. worker process was killed
+            result = RunResult(index, 1, repr(exc))
+
+        if result.failed:
+            failed.append(result)
+
+    pending: Dict["Future", int] = {}
+
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(run,),
+    ) as executor:
+        for index, item in items:
+            if len(pending) >= 2 * jobs:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future)
+
+            logging.info("__series__ run #%s/%s", index, count)
+            pending[executor.submit(_run_in_worker, index, item)] = index
+
+        for future in list(pending):
+            collect(future)
+
+    return failed
+
+
+async def run_concurrently(
+    run: Callable[[Any], Awaitable[None]],
+    items: Iterable[Tuple[int, Any]],
+    count: int,
+    concurrency: int,
+) -> List[RunResult]:
+    """Await `run(item)` for each indexed item, at most `concurrency` at once.
+
+    Items are consumed lazily (only once a slot is free). If the runner is
+    cancelled (e.g. by Ctrl-C), all pending runs are cancelled as well.
+
+    :returns: List[RunResult] -- results of the failed runs.
+    """
+    import asyncio
+
+    semaphore = asyncio.Semaphore(concurrency)
+    failed = []
+    pending: Set["Task"] = set()
+
+    async def execute(index, item):
+        try:
+            await run(item)
+        except (Exception, SystemExit) as exc:  # pylint: disable=broad-except
+            result = report_exception(index, exc)
+
+            if result.failed:
+                failed.append(result)
+        finally:
+            semaphore.release()
+
+    try:
+        for index, item in items:
+            await semaphore.acquire()
+
+            logging.info("__series__ run #%s/%s", index, count)
+            task = asyncio.ensure_future(execute(index, item))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+        await asyncio.gather(*pending)
+    finally:
+        for task in pending:
+            task.cancel()
+
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    return failed
@@ -0,0 +1,448 @@
+"""Per-class analysis of config dataclasses (cached)."""
+
+import sys
+from dataclasses import MISSING, Field, dataclass, fields
+from functools import cached_property, lru_cache
+from os import PathLike
+from pathlib import PurePath
+from types import MappingProxyType
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Literal,
+    Mapping,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+    get_args,
+    get_origin,
+    get_type_hints,
+)
+from weakref import WeakKeyDictionary
+
+import click
+
+
+class RequiredFieldMissing(RuntimeError):
+    def __init__(self, field_name):
+        text = f"Required field '{field_name}' was not set."
+        super().__init__(text)
+        self.field_name = field_name
+        self.message = text
+
+
+class InvalidFieldValue(ValueError):
+    def __init__(self, field_name, reason):
+        text = f"Invalid value for field '{field_name}': {reason}"
+        super().__init__(text)
+        self.field_name = field_name
+        self.message = text
+
+
+def get_param_decls(_field: Field) -> Tuple:
+    """Return complete `param_decls` for click option."""
+    partial_param_decls = _field.metadata.get("partial_param_decls", ())
+
+    if len(partial_param_decls) == 0:
+        # if no cli option was given, construct from identifier
+        partial_param_decls = (f"--{_field.name}",)
+
+    return partial_param_decls + (_field.name,)
+
+
+def get_attrs(_field: Field) -> Dict[str, Any]:
+    """Generate attributes used for creating click options."""
+
+    multiple = False
+    click_type: Any = None
+
+    # annotation of the field, retrieved by dataclass
+    annotation = _field.type
+
+    # generic base type (such as list, Literal)
+    origin = get_origin(annotation)
+
+    if origin is not None:
+        if origin is Literal:
+            click_type = click.Choice(get_args(annotation))
+        elif origin is list:
+            multiple = True
+            args = get_args(annotation)
+
+            if len(args) == 1:
+                click_type = args[0]
+        elif origin is Union:
+            # potentially an optional field
+            args = get_args(annotation)
+            if str in args:
+                click_type = str
+            elif len(args) == 2:
+                click_type = args[0]
+
+    elif issubclass(annotation, list):
+        multiple = True
+
+    else:
+        click_type = annotation
+
+    attrs = dict(_field.metadata.get("attrs", {}))
+
+    if multiple:
+        # test if multiple was explicitly set to false
+        assert attrs.get("multiple", True), (
+            f"Annotation '{annotation}' is not compatible with the"
+            "provided field (as multiple is set to False)."
+        )
+
+        attrs["multiple"] = True
+
+    if "type" not in attrs and click_type is not None:
+        # type has not been set explicitly
+        attrs["type"] = click_type
+
+    attrs["default"] = None  # defaults are handled by dataclass
+
+    return attrs
+
+
+@dataclass(frozen=True)
+class OptionSchema:
+    """Declaration of the click option of a single field.
+
+    :param name: Name of the field.
+    :param param_decls: Complete `param_decls` of the click option.
+    :param attrs: Attributes passed to the click option.
+    """
+
+    name: str
+    param_decls: Tuple[str, ...]
+    attrs: Mapping[str, Any]
+
+
+@dataclass(frozen=True)
+class ConfigSchema:
+    """Information on a config class which is required by click_config.
+
+    :param cls: The analyzed dataclass.
+    :param options: Click option declaration of each field.
+    :param field_names: Names of all fields (in order of declaration).
+    :param required: Names of the fields without default value.
+    :param defaults: Default values (of fields without default factory).
+    """
+
+    cls: Type
+    options: Tuple[OptionSchema, ...]
+    field_names: Tuple[str, ...]
+    required: Tuple[str, ...]
+    defaults: Mapping[str, Any]
+
+    @cached_property
+    def loader(self) -> Callable[[Mapping, Optional[Mapping]], Any]:
+        """Function creating an instance from a mapping (and overwrites)."""
+        return compile_loader(self)
+
+    @cached_property
+    def param_doc(self) -> Mapping[str, Optional[str]]:
+        """Descriptions of the fields (parsed from the class docstring)."""
+        # only needed for rendering help: imported here to speed up startup
+        from docstring_parser import parse as parse_docstring
+
+        if self.cls.__doc__ is None:
+            return MappingProxyType({})
+
+        return MappingProxyType(
+            {
+                param.arg_name: param.description
+                for param in parse_docstring(self.cls.__doc__).params
+            }
+        )
+
+
+_schemas: "WeakKeyDictionary[Type, ConfigSchema]" = WeakKeyDictionary()
+
+
+def get_schema(cls: Type) -> ConfigSchema:
+    """Return the (cached) schema of a config class.
+
+    :raises: TypeError -- if `cls` is not a dataclass.
+    """
+    try:
+        return _schemas[cls]
+    except KeyError:
+        pass
+
+    options = []
+    required = []
+    defaults = {}
+
+    for _field in fields(cls):
+        assert isinstance(_field, Field)
+
+        options.append(
+            OptionSchema(
+                _field.name,
+                get_param_decls(_field),
+                MappingProxyType(get_attrs(_field)),
+            )
+        )
+
+        if _field.default is not MISSING:
+            defaults[_field.name] = _field.default
+        elif _field.default_factory is MISSING:
+            required.append(_field.name)
+
+    schema = ConfigSchema(
+        cls,
+        options=tuple(options),
+        field_names=tuple(option.name for option in options),
+        required=tuple(required),
+        defaults=MappingProxyType(defaults),
+    )
+
+    _schemas[cls] = schema
+    return schema
+
+
+def get_converter(annotation: Any) -> Optional[Callable[[Any], Any]]:
+    """Return function converting values to the annotated type.
+
+    Only unambiguous conversions are made (e.g. `str` to `Path`, `int` to
+    `float`, sequences to `list`), other values are passed on unchanged.
+
+    :returns: Optional[Callable] -- None if no conversion is required.
+    """
+    origin = get_origin(annotation)
+    args = get_args(annotation)
+
+    if origin is Literal:
+
+        def convert_literal(value):
+            if value not in args:
+                raise ValueError(f"{value!r} is not one of {args!r}.")
+            return value
+
+        return convert_literal
+
+    if origin is list or annotation is list:
+        item_converter = get_converter(args[0]) if len(args) == 1 else None
+
+        def convert_list(value):
+            if isinstance(value, (str, bytes, Mapping)) or not isinstance(
+                value, Iterable
+            ):
+                raise TypeError(f"{value!r} is not a list.")
+
+            if item_converter is None:
+                return list(value)
+            return [item_converter(item) for item in value]
+
+        return convert_list
+
+    if origin is Union:
+        # optional field (None or a single type)
+        not_none = [arg for arg in args if arg is not type(None)]
+
+        if len(not_none) != 1:
+            return None
+
+        inner_converter = get_converter(not_none[0])
+
+        if inner_converter is None:
+            return None
+
+        def convert_optional(value):
+            return None if value is None else inner_converter(value)
+
+        return convert_optional
+
+    if annotation is float:
+
+        def convert_float(value):
+            if isinstance(value, int) and not isinstance(value, bool):
+                return float(value)
+            return value
+
+        return convert_float
+
+    if isinstance(annotation, type) and issubclass(annotation, PurePath):
+
+        def convert_path(value):
+            if isinstance(value, (str, PathLike)) and not isinstance(
+                value, annotation
+            ):
+                return annotation(value)
+            return value
+
+        return convert_path
+
+    return None
+
+
+def _conversion_code(
+    annotation: Any, key: str, namespace: Dict[str, Any]
+) -> List[str]:
+    """Return lines of code converting `value` to be stored in `data[key]`.
+
+    Common cases are converted inline, others call the converter function.
+    Objects referenced by the code are added to `namespace`.
+    """
+    origin = get_origin(annotation)
+    args = get_args(annotation)
+    target = f"data[{key!r}]"
+
+    if origin is Literal:
+        namespace[f"choices_{key}"] = args
+        return [
+            f"if value not in choices_{key}:",
+            f"    raise ValueError(repr(value) + {f' is not one of {args!r}.'!r})",
+        ]
+
+    if annotation is float:
+        return ["if type(value) is int:", f"    {target} = float(value)"]
+
+    if origin is Union:
+        not_none = [arg for arg in args if arg is not type(None)]
+
+        if len(not_none) == 1:
+            code = _conversion_code(not_none[0], key, namespace)
+
+            if code:
+                return ["if value is not None:"] + [
+                    f"    {line}" for line in code
+                ]
+
+        return []
+
+    converter = get_converter(annotation)
+
+    if converter is None:
+        return []
+
+    namespace[f"convert_{key}"] = converter
+
+    if isinstance(annotation, type) and issubclass(annotation, PurePath):
+        namespace[f"path_{key}"] = annotation
+        return [
+            "if type(value) is str:",
+            f"    {target} = path_{key}(value)",
+            f"elif not isinstance(value, path_{key}):",
+            f"    {target} = convert_{key}(value)",
+        ]
+
+    if (origin is list or annotation is list) and (
+        len(args) != 1 or get_converter(args[0]) is None
+    ):
+        # items do not need to be converted
+        return [
+            "if type(value) is not list:",
+            f"    {target} = convert_{key}(value)",
+        ]
+
+    return [f"{target} = convert_{key}(value)"]
+
+
+def compile_loader(
+    schema: ConfigSchema,
+) -> Callable[[Mapping, Optional[Mapping]], Any]:
+    """Generate a function creating instances of a config class.
+
+    The generated function merges data and overwrites, checks whether all
+    required fields are set, converts values to the annotated types, and
+    creates the instance. The code is generated specifically for the class
+    (similar to the methods generated by dataclasses), which avoids looping
+    over the fields in each call.
+    """
+    try:
+        type_hints = get_type_hints(schema.cls)
+    except Exception:  # pylint: disable=broad-except
+        # e.g. annotations can not be resolved
+        type_hints = {}
+
+    namespace: Dict[str, Any] = {
+        "cls": schema.cls,
+        "RequiredFieldMissing": RequiredFieldMissing,
+        "InvalidFieldValue": InvalidFieldValue,
+        "intern": sys.intern,
+    }
+
+    lines = [
+        "def from_dict(data, overwrite=None):",
+        "    data = {**data, **overwrite} if overwrite else data",
+        # keyword arguments are matched to parameters by identity first (and
+        # by comparing strings otherwise, which is quadratic in the number of
+        # fields)
+        "    data = {intern(key): value for key, value in data.items()}",
+    ]
+
+    for field_name in schema.required:
+        lines += [
+            f"    if {field_name!r} not in data:",
+            f"        raise RequiredFieldMissing({field_name!r})",
+        ]
+
+    for _field in fields(schema.cls):
+        key = _field.name
+        code = _conversion_code(
+            type_hints.get(key, _field.type), key, namespace
+        )
+
+        if not code:
+            continue
+
+        lines += [
+            f"    if {key!r} in data:",
+            f"        value = data[{key!r}]",
+            "        try:",
+            *(f"            {line}" for line in code),
+            "        except (TypeError, ValueError) as exc:",
+            f"            raise InvalidFieldValue({key!r}, exc) from exc",
+        ]
+
+    lines.append("    return cls(**data)")
+
+    exec("\n".join(lines), namespace)  # pylint: disable=exec-used
+    return namespace["from_dict"]
+
+
+class ConfigOption(click.Option):
+    """Click option of a config field.
+
+    If no help text is given explicitly, it is retrieved from the docstring of
+    the config class once help is actually rendered.
+    """
+
+    def __init__(self, *args, config_cls: Optional[Type] = None, **kw):
+        super().__init__(*args, **kw)
+        self.config_cls = config_cls
+
+    def _resolve_help(self):
+        if self.help is None and self.config_cls is not None:
+            self.help = get_schema(self.config_cls).param_doc.get(self.name)
+            self.config_cls = None
+
+    def get_help_record(self, ctx):
+        self._resolve_help()
+        return super().get_help_record(ctx)
+
+    def to_info_dict(self):
+        self._resolve_help()
+        return super().to_info_dict()
+
+
+@lru_cache(maxsize=None)
+def lazy_help_option(cls: Type[click.Option]) -> Type[ConfigOption]:
+    """Return subclass of an option class which retrieves help lazily.
+
+    Used for fields declaring their own option class (`field(cls=...)`): the
+    behavior of `ConfigOption` is added to the class.
+    """
+    if issubclass(cls, ConfigOption):
+        return cls
+
+    return type(
+        cls.__name__, (ConfigOption, cls), {"__module__": cls.__module__}
+    )
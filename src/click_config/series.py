@@ -0,0 +1,535 @@
+"""Expansion of `__series__` sections into individual configurations."""
+
+from itertools import islice, product
+from math import prod
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+# predicate deciding whether a point (mapping of all values) is valid
+Constraint = Callable[[Mapping[str, Any]], bool]
+
+
+def _unique(values: Iterable[Any]) -> Tuple[Any, ...]:
+    """Remove repeated values (keeping the order of first occurrence)."""
+    unique: List[Any] = []
+    seen: Set[Any] = set()
+    unhashable: List[Any] = []
+
+    for value in values:
+        try:
+            if value in seen:
+                continue
+            seen.add(value)
+        except TypeError:
+            # e.g. lists
+            if value in unhashable:
+                continue
+            unhashable.append(value)
+
+        unique.append(value)
+
+    return tuple(unique)
+
+
+def _sample_random(
+    sizes: Sequence[int], n: int, seed: Any
+) -> List[Tuple[int, ...]]:
+    """Draw `n` distinct grid points uniformly (without replacement)."""
+    import random
+
+    grid_size = prod(sizes)
+    indices = random.Random(seed).sample(range(grid_size), min(n, grid_size))
+
+    # decode the grid indices into positions in each axis
+    samples = []
+
+    for index in sorted(indices):
+        positions = []
+
+        for size in reversed(sizes):
+            index, position = divmod(index, size)
+            positions.append(position)
+
+        samples.append(tuple(reversed(positions)))
+
+    return samples
+
+
+def _sample_lhs(
+    sizes: Sequence[int], n: int, seed: Any
+) -> List[Tuple[int, ...]]:
+    """Draw `n` points using latin hypercube sampling.
+
+    Each axis is split into `n` strata, each of which is hit exactly once.
+    """
+    import random
+
+    rng = random.Random(seed)
+    columns = []
+
+    for size in sizes:
+        strata = list(range(n))
+        rng.shuffle(strata)
+        columns.append(
+            [int((stratum + rng.random()) / n * size) for stratum in strata]
+        )
+
+    return list(zip(*columns)) if sizes else [()] * min(n, 1)
+
+
+def _sample_sobol(
+    sizes: Sequence[int], n: int, seed: Any
+) -> List[Tuple[int, ...]]:
+    """Draw `n` points from a scrambled Sobol sequence."""
+    if not sizes:
+        return [()] * min(n, 1)
+
+    try:
+        from scipy.stats import qmc
+    except ModuleNotFoundError as exc:
+        # reported like other invalid __sample__ specifications
+        raise ValueError(
+            "Package scipy is required for sobol sampling."
+        ) from exc
+
+    sampler = qmc.Sobol(d=len(sizes), scramble=True, seed=seed)
+
+    return [
+        tuple(int(u * size) for u, size in zip(row, sizes))
+        for row in sampler.random(n)
+    ]
+
+
+_samplers = {
+    "random": _sample_random,
+    "lhs": _sample_lhs,
+    "sobol": _sample_sobol,
+}
+
+
+class _Exclusion:
+    """Combination of values which must not occur in a series.
+
+    :param conditions: Required value of each constrained axis (given as
+        index of the axis, position of the key in the axis, and value).
+    """
+
+    def __init__(self, conditions: Sequence[Tuple[int, int, Any]]):
+        self.conditions = tuple(conditions)
+        self.last_axis = max(axis for axis, _, _ in conditions)
+
+    def matches(self, values: Sequence[Tuple[Any, ...]]) -> bool:
+        """Whether the values of all axes match the conditions."""
+        return all(
+            values[axis][position] == value
+            for axis, position, value in self.conditions
+        )
+
+    def contradicted(self, axis: int, values: Tuple[Any, ...]) -> bool:
+        """Whether the values of an axis violate one of the conditions."""
+        return any(
+            values[position] != value
+            for condition_axis, position, value in self.conditions
+            if condition_axis == axis
+        )
+
+
+class Series:
+    """Lazily expanded grid of configurations.
+
+    Each point of the grid combines the (shared) `data` with one combination
+    of the values listed in the `__series__` section (repeated values are
+    removed). The points are generated on demand, so the grid is never
+    materialized as a whole.
+
+    Besides mappings of field names to lists of values, the section may
+    contain:
+
+    - `__zip__`: (list of) mapping(s) of fields to equally long lists of
+      values; the fields of one mapping vary together (as one axis).
+    - `__exclude__`: list of mappings of fields to values; points matching
+      all values of one of the mappings are excluded. Excluded branches of
+      the grid are pruned without being expanded.
+    - `__sample__`: mapping with keys `n` (number of samples), `method`
+      (`random`, `lhs`, or `sobol`; default: `random`), and `seed` (default:
+      0). Instead of the whole grid, the series consists of (at most) `n`
+      distinct points drawn from it (excluded samples are dropped). The samples are decoded
+      directly, without enumerating the grid.
+
+    Additionally, `constraints` (predicates receiving the values of a point,
+    including `data` and `overwrite`) may exclude points.
+
+    Without exclusions and constraints, the number of points and the point
+    at a given index are computed without enumerating the grid. Exclusions
+    require a partial enumeration for counting, constraints a full one.
+
+    :param data: Values shared by all points of the series.
+    :param series: Mapping of field names to the values they take on.
+    :param overwrite: Values which take precedence over the series (axes of
+        these fields are dropped).
+    :param constraints: Predicates each point needs to fulfill.
+    :param defaults: Values of fields which are not set otherwise (e.g. the
+        defaults of the config class), used for matching exclusions.
+    :raises: ValueError -- e.g. if an exclusion refers to a field which is
+        neither varied nor set (nor has a default value).
+    """
+
+    def __init__(
+        self,
+        data: Mapping[str, Any],
+        series: Mapping[str, Any],
+        overwrite: Optional[Mapping[str, Any]] = None,
+        constraints: Sequence[Constraint] = (),
+        defaults: Optional[Mapping[str, Any]] = None,
+    ):
+        overwrite = overwrite or {}
+
+        self.data = data
+        self.overwrite = overwrite
+        self.constraints = tuple(constraints)
+        self.defaults = defaults or {}
+
+        # each axis consists of one or more (zipped) fields
+        axis_keys: List[Tuple[str, ...]] = []
+        axes: List[Tuple[Tuple[Any, ...], ...]] = []
+        nominal_sizes = []
+
+        for key, values in series.items():
+            if key in ("__exclude__", "__sample__"):
+                continue
+
+            if key == "__zip__":
+                groups = [values] if isinstance(values, Mapping) else values
+            else:
+                groups = [{key: values}]
+
+            for group in groups:
+                lengths = {
+                    len(group_values) for group_values in group.values()
+                }
+
+                if len(lengths) > 1:
+                    raise ValueError(
+                        "Zipped __series__ values need to be of equal length "
+                        f"({', '.join(group)})."
+                    )
+
+                nominal_sizes.append(lengths.pop() if lengths else 1)
+
+                # fields which are overwritten would only produce duplicates
+                keys = tuple(k for k in group if k not in overwrite)
+
+                if len(keys) > 0:
+                    axis_keys.append(keys)
+                    axes.append(_unique(zip(*(group[k] for k in keys))))
+
+        self.axis_keys = tuple(axis_keys)
+        self.axes = tuple(axes)
+        self.keys = tuple(key for keys in self.axis_keys for key in keys)
+
+        self.nominal_size = prod(nominal_sizes)
+        self.grid_size = prod(len(values) for values in self.axes)
+
+        # number of points covered by the axes following each axis
+        self._strides: List[int] = []
+        stride = 1
+
+        for values in reversed(self.axes):
+            self._strides.insert(0, stride)
+            stride *= len(values)
+
+        self.exclusions = self._compile_exclusions(
+            series.get("__exclude__", [])
+        )
+
+        # positions (in each axis) of the sampled points
+        self.samples: Optional[List[Tuple[int, ...]]] = None
+
+        if "__sample__" in series:
+            self.samples = self._draw_samples(series["__sample__"])
+
+        self._valid_samples: Optional[List[Tuple[Tuple[Any, ...], ...]]]
+        self._valid_samples = None
+
+        self._size: Optional[int] = None
+
+        if self.samples is None and not self.filtered:
+            self._size = self.grid_size
+
+    def _draw_samples(self, spec: Mapping[str, Any]) -> List[Tuple[int, ...]]:
+        try:
+            n = int(spec["n"])
+        except (KeyError, TypeError, ValueError) as exc:
+            raise ValueError(
+                "__sample__ requires the number of samples 'n'."
+            ) from exc
+
+        method = spec.get("method", "random")
+
+        if method not in _samplers:
+            raise ValueError(
+                f"Unknown __sample__ method {method!r} (supported are "
+                f"{', '.join(_samplers)})."
+            )
+
+        if n < 1:
+            raise ValueError("__sample__ requires n >= 1.")
+
+        samples = _samplers[method](
+            [len(values) for values in self.axes],
+            min(n, self.grid_size),
+            spec.get("seed", 0),
+        )
+
+        # samplers may hit a grid point more than once (e.g. if axes are
+        # shorter than n): each point is run once (keeping the order)
+        return list(dict.fromkeys(samples))
+
+    def _get_valid_samples(self) -> List[Tuple[Tuple[Any, ...], ...]]:
+        """Values of the samples which are not excluded."""
+        if self._valid_samples is None:
+            assert self.samples is not None
+            valid = []
+
+            for positions in self.samples:
+                values = tuple(
+                    axis[position]
+                    for axis, position in zip(self.axes, positions)
+                )
+
+                if any(
+                    exclusion.matches(values) for exclusion in self.exclusions
+                ):
+                    continue
+
+                if self._is_valid(self._point(values)):
+                    valid.append(values)
+
+            self._valid_samples = valid
+
+        return self._valid_samples
+
+    def _compile_exclusions(
+        self, exclusions: Iterable[Mapping[str, Any]]
+    ) -> Tuple[_Exclusion, ...]:
+        fixed = {**self.defaults, **self.data, **self.overwrite}
+
+        positions = {
+            key: (axis, position)
+            for axis, keys in enumerate(self.axis_keys)
+            for position, key in enumerate(keys)
+        }
+
+        compiled = []
+
+        for exclusion in exclusions:
+            conditions = []
+
+            for key, value in exclusion.items():
+                if key in positions:
+                    conditions.append((*positions[key], value))
+                elif key not in fixed:
+                    raise ValueError(
+                        f"__exclude__ entry {dict(exclusion)!r} refers to "
+                        f"'{key}', which is neither varied nor set."
+                    )
+                elif fixed[key] != value:
+                    # exclusion can not match any point
+                    break
+            else:
+                if len(conditions) == 0:
+                    raise ValueError(
+                        f"__exclude__ entry {dict(exclusion)!r} excludes "
+                        "every point of the __series__."
+                    )
+                compiled.append(_Exclusion(conditions))
+
+        return tuple(compiled)
+
+    @property
+    def filtered(self) -> bool:
+        """Whether points of the grid are excluded."""
+        return len(self.exclusions) > 0 or len(self.constraints) > 0
+
+    @property
+    def fields(self) -> Set[str]:
+        """Names of the fields which are set in each point of the series."""
+        return set(self.data) | set(self.keys)
+
+    def __len__(self) -> int:
+        if self._size is None:
+            if self.samples is not None:
+                self._size = len(self._get_valid_samples())
+            elif self.constraints:
+                self._size = sum(1 for _ in self)
+            else:
+                self._size = self._count(0, self.exclusions)
+
+        return self._size
+
+    def _remaining_exclusions(
+        self, axis: int, values: Tuple[Any, ...], active: Sequence[_Exclusion]
+    ) -> Optional[List[_Exclusion]]:
+        """Return exclusions which may still apply after choosing `values`.
+
+        :returns: None if the branch is excluded entirely.
+        """
+        remaining = []
+
+        for exclusion in active:
+            if exclusion.contradicted(axis, values):
+                continue
+            if exclusion.last_axis == axis:
+                return None
+            remaining.append(exclusion)
+
+        return remaining
+
+    def _count(self, axis: int, active: Sequence[_Exclusion]) -> int:
+        """Count points in a subtree, given the exclusions which may apply."""
+        if not active:
+            # no exclusion can match in this subtree
+            return prod(len(values) for values in self.axes[axis:])
+
+        count = 0
+
+        for values in self.axes[axis]:
+            remaining = self._remaining_exclusions(axis, values, active)
+
+            if remaining is not None:
+                count += self._count(axis + 1, remaining)
+
+        return count
+
+    def _iter_values(
+        self, axis: int, active: Sequence[_Exclusion]
+    ) -> Iterator[Tuple[Tuple[Any, ...], ...]]:
+        """Iterate over value combinations of a subtree (pruning exclusions)."""
+        if not active:
+            yield from product(*self.axes[axis:])
+            return
+
+        for values in self.axes[axis]:
+            remaining = self._remaining_exclusions(axis, values, active)
+
+            if remaining is not None:
+                for rest in self._iter_values(axis + 1, remaining):
+                    yield (values,) + rest
+
+    def _point(self, values: Iterable[Tuple[Any, ...]]) -> Dict[str, Any]:
+        point = dict(self.data)
+
+        for keys, axis_values in zip(self.axis_keys, values):
+            point.update(zip(keys, axis_values))
+
+        return point
+
+    def _is_valid(self, point: Mapping[str, Any]) -> bool:
+        if not self.constraints:
+            return True
+
+        values = {**point, **self.overwrite}
+        return all(constraint(values) for constraint in self.constraints)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        if self.samples is not None:
+            for values in self._get_valid_samples():
+                yield self._point(values)
+            return
+
+        for values in self._iter_values(0, self.exclusions):
+            point = self._point(values)
+
+            if self._is_valid(point):
+                yield point
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        """Return the point at position `index` of the series.
+
+        Without exclusions and constraints, the index is decoded directly (as
+        a mixed-radix number with the last axis varying fastest), hence the
+        order matches the one of `iter` without enumerating the preceding
+        points. Sampled series are indexed by sample.
+        """
+        size = len(self)
+
+        if index < 0:
+            index += size
+
+        if not 0 <= index < size:
+            raise IndexError(
+                f"Series index out of range (series has {size} points)."
+            )
+
+        if self.samples is not None:
+            return self._point(self._get_valid_samples()[index])
+
+        if self.filtered:
+            return next(islice(self, index, None))
+
+        values = []
+
+        for axis, stride in zip(self.axes, self._strides):
+            position, index = divmod(index, stride)
+            values.append(axis[position])
+
+        return self._point(values)
+
+    def shard(self, index: int, count: int, strided: bool = False) -> range:
+        """Return the indices of the points in one shard of the series.
+
+        The shards partition the series: each point belongs to exactly one of
+        them. Contiguous shards cover consecutive points (and differ in size by
+        at most one), strided shards take every `count`-th point.
+
+        :param index: Index of the shard (`0 <= index < count`).
+        :param count: Total number of shards.
+        :param strided: Whether to use strided instead of contiguous shards.
+        """
+        if not 0 <= index < count:
+            raise IndexError(f"Shard {index}/{count} does not exist.")
+
+        size = len(self)
+
+        if strided:
+            return range(index, size, count)
+
+        return range(index * size // count, (index + 1) * size // count)
+
+    def points(
+        self, indices: Optional[Iterable[int]] = None
+    ) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Iterate over pairs of index and point.
+
+        :param indices: Indices of the points to include (default: all).
+        """
+        if indices is None:
+            yield from enumerate(self)
+        elif self.filtered and self.samples is None:
+            # points can only be reached by enumerating the series
+            selected = indices if isinstance(indices, range) else set(indices)
+
+            if len(selected) == 0:
+                return
+
+            last = max(selected)
+
+            for index, point in enumerate(self):
+                if index in selected:
+                    yield index, point
+                if index >= last:
+                    break
+        else:
+            for index in indices:
+                yield index, self[index]
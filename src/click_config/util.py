@@ -1,113 +1,674 @@
+import io
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
 from os import PathLike
-from pathlib import Path
-from typing import Any, Callable, Dict, Mapping
+from pathlib import Path, PurePath
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Tuple
 
+# modification time, size and inode of a file
+Signature = Tuple[int, int, int]
 
-def get_loader(extension):
-    """Load relevant module for reading a file with the given extension."""
-    if extension not in ("toml", "yaml", "yml", "json"):
+# (resolved) paths and signatures of the files a config was read from
+Files = Tuple[Tuple[str, Signature], ...]
+
+
+@dataclass(frozen=True)
+class FileHandler:
+    """Function reading from (or writing to) an opened config file.
+
+    :param func: Either `func(file) -> data` (reader) or `func(data, file)`
+        (writer).
+    :param binary: Whether the file needs to be opened in binary mode.
+    """
+
+    func: Callable
+    binary: bool = False
+
+
+# factories return the handler using the fastest available backend
+_reader_factories: Dict[str, Callable[[], FileHandler]] = {}
+_writer_factories: Dict[str, Callable[[], FileHandler]] = {}
+
+# resolved handlers (per kind and extension)
+_handlers: Dict[Tuple[str, str], FileHandler] = {}
+
+
+def register_format(
+    extensions: Iterable[str],
+    reader: Optional[Callable] = None,
+    writer: Optional[Callable] = None,
+    *,
+    binary: bool = False,
+):
+    """Register functions for reading and/or writing a file format.
+
+    Example (msgpack):
+    `register_format(["msgpack"], msgpack.unpack, msgpack.pack, binary=True)`
+
+    :param extensions: File extensions (without leading dot) of the format.
+    :param reader: Function returning the data from an opened file.
+    :param writer: Function writing data to an opened file (`writer(data,
+        file)`).
+    :param binary: Whether files need to be opened in binary mode.
+    """
+    reader_factory = (
+        None if reader is None else (lambda: FileHandler(reader, binary))
+    )
+    writer_factory = (
+        None if writer is None else (lambda: FileHandler(writer, binary))
+    )
+
+    _register_factories(extensions, reader_factory, writer_factory)
+
+
+def _register_factories(
+    extensions: Iterable[str],
+    reader_factory: Optional[Callable[[], FileHandler]],
+    writer_factory: Optional[Callable[[], FileHandler]],
+):
+    for extension in extensions:
+        if reader_factory is not None:
+            _reader_factories[extension] = reader_factory
+            _handlers.pop(("read", extension), None)
+
+        if writer_factory is not None:
+            _writer_factories[extension] = writer_factory
+            _handlers.pop(("write", extension), None)
+
+
+def _get_handler(kind: str, extension: str) -> FileHandler:
+    try:
+        return _handlers[kind, extension]
+    except KeyError:
+        pass
+
+    factories = _reader_factories if kind == "read" else _writer_factories
+
+    if extension not in factories:
+        supported = ", ".join(f".{ext}" for ext in sorted(factories))
         raise RuntimeError(
             f"Unrecognized file format: '.{extension}' "
-            "(supported are .toml, .yaml, and .json)."
+            f"(supported are {supported})."
         )
 
-    loader: Callable
+    handler = factories[extension]()
+    _handlers[kind, extension] = handler
+    return handler
 
-    if extension == "toml":
-        try:
-            from toml import load as toml_loader
 
-            loader = toml_loader
-        except ModuleNotFoundError as exc:
-            raise RuntimeError(
-                f"Package toml is required to read .{extension} files."
-            ) from exc
+def _missing_package(package: str, kind: str, extension: str):
+    return RuntimeError(
+        f"Package {package} is required to {kind} .{extension} files."
+    )
+
+
+_CONTAINERS = {dict, list, tuple}
+
+
+def _any_float(data: Any, predicate: Callable[[float], bool]) -> bool:
+    """Whether a float nested in the data fulfills the predicate."""
+    if type(data) not in _CONTAINERS:
+        return type(data) is float and predicate(data)
+
+    values = data.values() if type(data) is dict else data
+
+    # cheap for the common case of (flat) mappings without floats
+    types = set(map(type, values))
+
+    if float in types and any(
+        predicate(value) for value in values if type(value) is float
+    ):
+        return True
+
+    if types.isdisjoint(_CONTAINERS):
+        return False
+
+    return any(
+        _any_float(value, predicate)
+        for value in values
+        if type(value) in _CONTAINERS
+    )
+
+
+def _beyond_int64(value: float) -> bool:
+    return abs(value) >= 2**63
+
+
+def _non_finite(value: float) -> bool:
+    return value != value or value in (float("inf"), float("-inf"))
+
+
+def _json_reader() -> FileHandler:
+    import json
+
+    try:
+        import orjson
+    except ModuleNotFoundError:
+        return FileHandler(json.load)
+
+    def load(json_file):
+        content = json_file.read()
 
-    elif extension in ("yaml", "yl"):
         try:
-            from yaml import safe_load as yaml_loader
+            data = orjson.loads(content)
+        except orjson.JSONDecodeError:
+            # e.g. NaN, which json accepts
+            return json.loads(content)
+
+        if _any_float(data, _beyond_int64):
+            # orjson rounds integers beyond 64 bits to floats
+            return json.loads(content)
+
+        return data
+
+    return FileHandler(load, binary=True)
+
+
+def _json_writer() -> FileHandler:
+    import json
+
+    try:
+        import orjson
+    except ModuleNotFoundError:
+        return FileHandler(json.dump)
+
+    def dump(data, json_file):
+        # orjson writes NaN and infinity as null
+        if not _any_float(data, _non_finite):
+            try:
+                content = orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+            except TypeError:
+                # e.g. integers beyond 64 bits
+                pass
+            else:
+                json_file.write(content)
+                return
+
+        json_file.write(json.dumps(data).encode("utf-8"))
+
+    return FileHandler(dump, binary=True)
+
+
+def _yaml_reader() -> FileHandler:
+    try:
+        import yaml
+    except ModuleNotFoundError as exc:
+        raise _missing_package("pyyaml", "read", "yaml") from exc
+
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+    def load(yaml_file):
+        return yaml.load(yaml_file, Loader=loader)
+
+    return FileHandler(load)
+
+
+def _yaml_writer() -> FileHandler:
+    try:
+        import yaml
+    except ModuleNotFoundError as exc:
+        raise _missing_package("pyyaml", "write", "yaml") from exc
+
+    class Dumper(getattr(yaml, "CSafeDumper", yaml.SafeDumper)):  # type: ignore
+        """Safe dumper which also represents tuples and paths."""
+
+    Dumper.add_representer(tuple, Dumper.represent_list)
+    Dumper.add_multi_representer(
+        PurePath, lambda dumper, path: dumper.represent_str(str(path))
+    )
+
+    def dump(data, yaml_file):
+        yaml.dump(data, yaml_file, Dumper=Dumper)
+
+    return FileHandler(dump)
+
+
+def _toml_reader() -> FileHandler:
+    try:
+        import tomllib  # type: ignore
+
+        return FileHandler(tomllib.load, binary=True)
+    except ModuleNotFoundError:
+        pass
+
+    try:
+        import tomli
+
+        return FileHandler(tomli.load, binary=True)
+    except ModuleNotFoundError:
+        pass
+
+    try:
+        import toml
+
+        return FileHandler(toml.load)
+    except ModuleNotFoundError as exc:
+        raise _missing_package("toml", "read", "toml") from exc
+
+
+def _toml_writer() -> FileHandler:
+    try:
+        import tomli_w
+
+        return FileHandler(tomli_w.dump, binary=True)
+    except ModuleNotFoundError:
+        pass
+
+    try:
+        import toml
+
+        return FileHandler(toml.dump)
+    except ModuleNotFoundError as exc:
+        raise _missing_package("toml", "write", "toml") from exc
+
+
+_register_factories(["json"], _json_reader, _json_writer)
+_register_factories(["yaml", "yml"], _yaml_reader, _yaml_writer)
+_register_factories(["toml"], _toml_reader, _toml_writer)
+
+
+def get_read_handler(extension: str) -> FileHandler:
+    """Return handler for reading a file with the given extension.
+
+    The handler states whether the file needs to be opened in binary mode.
+    """
+    return _get_handler("read", extension)
+
+
+def get_write_handler(extension: str) -> FileHandler:
+    """Return handler for writing a file with the given extension.
+
+    The handler states whether the file needs to be opened in binary mode.
+    """
+    return _get_handler("write", extension)
+
+
+def get_loader(extension: str) -> Callable:
+    """Return function for reading a file with the given extension.
+
+    The function accepts files opened in text mode (as well as binary files,
+    if the backend reads binary files). Use `get_read_handler` to avoid
+    decoding text for binary backends.
+    """
+    handler = get_read_handler(extension)
+
+    if not handler.binary:
+        return handler.func
+
+    def load(conf_file):
+        if isinstance(conf_file, io.TextIOBase):
+            conf_file = io.BytesIO(conf_file.read().encode("utf-8"))
+
+        return handler.func(conf_file)
+
+    return load
+
+
+def get_writer(extension: str) -> Callable:
+    """Return function for writing a file with the given extension.
+
+    The function accepts files opened in text mode (as well as binary files,
+    if the backend writes binary files). Use `get_write_handler` to avoid
+    encoding text for binary backends.
+    """
+    handler = get_write_handler(extension)
+
+    if not handler.binary:
+        return handler.func
+
+    def dump(data, conf_file):
+        if not isinstance(conf_file, io.TextIOBase):
+            return handler.func(data, conf_file)
+
+        buffer = io.BytesIO()
+        handler.func(data, buffer)
+        conf_file.write(buffer.getvalue().decode("utf-8"))
+
+    return dump
+
+
+def _file_signature(path: str) -> Signature:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def _unchanged(files: Files) -> bool:
+    try:
+        return all(_file_signature(path) == sig for path, sig in files)
+    except OSError:
+        return False
+
+
+class ConfigFileCache:
+    """Least recently used cache of parsed config files.
+
+    Entries are keyed by the resolved path and invalidated if the modification
+    time, size or inode of the file (or of any file it is composed of)
+    change. The parsed data is stored pickled: each access returns a fresh
+    copy, so callers may modify it.
+
+    :param max_entries: Maximum number of cached files.
+    :param max_bytes: Maximum total size of the (pickled) cached data.
+    """
+
+    def __init__(self, max_entries: int = 128, max_bytes: int = 64 * 2**20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Files, bytes]]"
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def read(
+        self, path: PathLike, load: Callable[[PathLike], Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Return the parsed content of a file (using `load` on a miss)."""
+        import pickle
+
+        key = os.path.realpath(path)
+        files = ((key, _file_signature(key)),)
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and entry[0] == files:
+                self._entries.move_to_end(key)
+                return pickle.loads(entry[1])
+
+        data = load(path)
+        self.put(key, files, data)
+        return data
+
+    def get(self, key: str) -> Optional[Tuple[Files, Any]]:
+        """Return the files of a valid entry and (a copy of) its data.
+
+        Returns None if the entry is not cached or any of its files changed.
+        """
+        import pickle
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+        if entry is None or not _unchanged(entry[0]):
+            return None
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+
+        return entry[0], pickle.loads(entry[1])
+
+    def put(self, key: str, files: Files, data: Any):
+        """Store data read from the given files (with their signatures)."""
+        import pickle
 
-            loader = yaml_loader
-        except ModuleNotFoundError as exc:
-            raise RuntimeError(
-                f"Package pyyaml is required to read .{extension} files."
-            ) from exc
-    else:
         try:
-            from json import load as json_loader
+            pickled = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:  # pylint: disable=broad-except
+            # data can not be copied safely: do not cache it
+            return
 
-            loader = json_loader
-        except ModuleNotFoundError as exc:
-            raise RuntimeError(
-                f"Package json is required to read .{extension} files."
-            ) from exc
+        with self._lock:
+            self._remove(key)
 
-    return loader
+            if len(pickled) <= self.max_bytes:
+                self._entries[key] = (files, pickled)
+                self._size += len(pickled)
 
+            while (
+                len(self._entries) > self.max_entries
+                or self._size > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
 
-def read_config_file(path: PathLike) -> Dict[str, Any]:
-    """Read config file.
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+
+        if entry is not None:
+            self._size -= len(entry[1])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# cache used by read_config_file (disabled by default)
+_config_file_cache: Optional[ConfigFileCache] = None
 
-    Can be of type toml, yaml, or json.
+
+def enable_config_cache(
+    max_entries: int = 128, max_bytes: int = 64 * 2**20
+) -> ConfigFileCache:
+    """Cache parsed config files (see `ConfigFileCache`).
+
+    Useful if the same files are read repeatedly within one process.
     """
-    extension = Path(path).suffix[1:]
+    global _config_file_cache
+    _config_file_cache = ConfigFileCache(max_entries, max_bytes)
+    return _config_file_cache
 
-    loader = get_loader(extension)
 
-    with open(path, "r", encoding="utf-8") as conf_file:
-        return loader(conf_file)
+def disable_config_cache():
+    global _config_file_cache
+    _config_file_cache = None
 
 
-def get_writer(extension):
-    """Load relevant module for reading a file with the given extension."""
-    if extension not in ("toml", "yaml", "yml", "json"):
-        raise RuntimeError(
-            f"Unrecognized file format: '.{extension}' "
-            "(supported are .toml, .yaml, and .json)."
+EXTENDS = "__extends__"
+INCLUDE = "__include__"
+
+# files included by other files (parsed once per process, while unchanged)
+_included_file_cache = ConfigFileCache()
+
+# results of composing files (keyed by the signatures of all involved files)
+_composed_cache = ConfigFileCache(max_entries=1024)
+
+
+class CompositionError(ValueError):
+    def __init__(self, path, reason):
+        text = f"Invalid composition of config file '{path}': {reason}"
+        super().__init__(text)
+        self.path = path
+        self.message = text
+
+
+def merge_configs(
+    base: Mapping[str, Any], override: Mapping[str, Any]
+) -> Dict[str, Any]:
+    """Deeply merge two configs.
+
+    Mappings are merged recursively, any other value (including lists) of
+    `override` replaces the value of `base`. Keys keep the order of their
+    first occurrence. Neither of the configs is modified.
+    """
+    merged = dict(base)
+
+    for key, value in override.items():
+        base_value = merged.get(key)
+
+        if isinstance(value, Mapping) and isinstance(base_value, Mapping):
+            merged[key] = merge_configs(base_value, value)
+        else:
+            merged[key] = value
+
+    return merged
+
+
+def _has_directives(data: Dict[str, Any]) -> bool:
+    if EXTENDS in data or INCLUDE in data:
+        return True
+
+    # called for every file read: only recurse into (rare) nested mappings
+    for value in data.values():
+        if type(value) is dict and _has_directives(value):
+            return True
+
+    return False
+
+
+class _Composition:
+    """Resolution of the files a config file is composed of.
+
+    Included files are resolved depth-first; a file which (indirectly)
+    includes itself is an error.
+    """
+
+    def __init__(self, path: str, signature: Signature):
+        self.files: Dict[str, Signature] = {path: signature}
+
+    def read(self, path: str, stack: Tuple[str, ...]) -> Dict[str, Any]:
+        if path in stack:
+            start = stack.index(path)
+            cycle = stack[start:] + (path,)
+            raise CompositionError(
+                stack[0], f"cyclic includes ({' -> '.join(cycle)})."
+            )
+
+        # signature needs to be taken before the file is read
+        self.files.setdefault(path, _file_signature(path))
+        data = _included_file_cache.read(Path(path), _read_config_file)
+
+        if not isinstance(data, dict):
+            raise CompositionError(path, "included file is not a mapping.")
+
+        return self.resolve(data, path, stack + (path,), top_level=True)
+
+    def resolve(
+        self,
+        data: Dict[str, Any],
+        path: str,
+        stack: Tuple[str, ...],
+        top_level: bool = False,
+    ) -> Dict[str, Any]:
+        if EXTENDS in data and not top_level:
+            raise CompositionError(
+                path, f"{EXTENDS} is only allowed at the top level."
+            )
+
+        names = self._names(data, EXTENDS, path) + self._names(
+            data, INCLUDE, path
         )
+        directory = os.path.dirname(path)
 
-    writer: Callable
+        merged: Dict[str, Any] = {}
 
-    if extension == "toml":
-        try:
-            from toml import dump as toml_dump
+        for name in names:
+            included = os.path.realpath(os.path.join(directory, name))
+            merged = merge_configs(merged, self.read(included, stack))
 
-            writer = toml_dump
-        except ModuleNotFoundError as exc:
-            raise RuntimeError(
-                f"Package toml is required to read .{extension} files."
-            ) from exc
+        own = {
+            key: (
+                self.resolve(value, path, stack)
+                if isinstance(value, dict) and _has_directives(value)
+                else value
+            )
+            for key, value in data.items()
+            if key not in (EXTENDS, INCLUDE)
+        }
 
-    elif extension in ("yaml", "yl"):
-        try:
-            from yaml import dump as yaml_dump
+        return merge_configs(merged, own) if names else own
+
+    @staticmethod
+    def _names(data: Dict[str, Any], directive: str, path: str):
+        names = data.get(directive, [])
 
-            writer = yaml_dump
-        except ModuleNotFoundError as exc:
-            raise RuntimeError(
-                f"Package pyyaml is required to write .{extension} files."
-            ) from exc
+        if isinstance(names, str):
+            return [names]
+
+        if not isinstance(names, list) or not all(
+            isinstance(name, str) for name in names
+        ):
+            raise CompositionError(
+                path, f"{directive} needs to be a path or a list of paths."
+            )
+
+        return names
+
+
+def read_config_file(path: PathLike) -> Dict[str, Any]:
+    """Read config file.
+
+    Can be of type toml, yaml, or json (or any format registered via
+    `register_format`). If enabled (`enable_config_cache`), parsed files are
+    cached.
+
+    Files can be composed of other files (paths are relative to the including
+    file): `__extends__` (at the top level) and `__include__` (in any
+    mapping) name a file or a list of files, which are deeply merged (see
+    `merge_configs`) in the given order, followed by the remaining values of
+    the mapping. Included files are parsed once per process (as long as they
+    do not change) and composed results are cached until any of the involved
+    files changes.
+
+    :raises: CompositionError -- if the directives are invalid or files
+        include each other.
+    """
+    return read_config_file_and_sources(path)[0]
+
+
+def read_config_file_and_sources(
+    path: PathLike,
+) -> Tuple[Dict[str, Any], Files]:
+    """Read config file, like `read_config_file`.
+
+    Additionally returns the paths of all files the config was composed of
+    (starting with the file itself), together with their modification time,
+    size and inode (taken before they were read).
+    """
+    # (cheaper than resolving symlinks, which only included files need)
+    key = os.path.abspath(path)
+    cached = _composed_cache.get(key)
+
+    if cached is not None:
+        files, data = cached
+        return data, files
+
+    # unknown formats fail before the file is accessed
+    _get_handler("read", Path(path).suffix[1:])
+    signature = _file_signature(key)
+
+    if _config_file_cache is not None:
+        data = _config_file_cache.read(path, _read_config_file)
     else:
-        try:
-            from json import dump as json_dump
+        data = _read_config_file(path)
 
-            writer = json_dump
-        except ModuleNotFoundError as exc:
-            raise RuntimeError(
-                f"Package json is required to read .{extension} files."
-            ) from exc
+    if not isinstance(data, dict) or not _has_directives(data):
+        return data, ((key, signature),)
 
-    return writer
+    composition = _Composition(key, signature)
+    data = composition.resolve(data, key, (key,), top_level=True)
+    files = tuple(composition.files.items())
+    _composed_cache.put(key, files, data)
+    return data, files
+
+
+def _read_config_file(path: PathLike) -> Dict[str, Any]:
+    handler = _get_handler("read", Path(path).suffix[1:])
+
+    if handler.binary:
+        with open(path, "rb") as conf_file:
+            return handler.func(conf_file)
+
+    with open(path, "r", encoding="utf-8") as conf_file:
+        return handler.func(conf_file)
 
 
 def write_config_file(path: PathLike, data: Mapping[str, Any]):
     """Save config file.
 
-    Can be of type toml, yaml, or json.
+    Can be of type toml, yaml, or json (or any format registered via
+    `register_format`).
     """
-    extension = Path(path).suffix[1:]
+    handler = _get_handler("write", Path(path).suffix[1:])
 
-    writer = get_writer(extension)
+    if handler.binary:
+        with open(path, "wb") as conf_file:
+            return handler.func(data, conf_file)
 
     with open(path, "w", encoding="utf-8") as conf_file:
-        return writer(data, conf_file)
+        return handler.func(data, conf_file)
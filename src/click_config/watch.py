@@ -0,0 +1,224 @@
+"""Reloading of configs once their file changes."""
+
+import logging
+import os
+import threading
+from os import PathLike
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from .schema import get_schema
+from .util import Files, Signature, read_config_file_and_sources
+
+# changed fields: name -> (old value, new value)
+Changes = Dict[str, Tuple[Any, Any]]
+
+
+def diff_configs(old: Any, new: Any) -> Changes:
+    """Return the fields whose values differ between two configs."""
+    changes = {}
+
+    for name in get_schema(type(new)).field_names:
+        old_value = getattr(old, name)
+        new_value = getattr(new, name)
+
+        if old_value != new_value:
+            changes[name] = (old_value, new_value)
+
+    return changes
+
+
+class ConfigWatcher:
+    """Thread which rebuilds a config whenever its file changes.
+
+    Changes are detected by polling the modification time, size and inode
+    (`os.stat`) of the file and of all files it is composed of (via
+    `__extends__` or `__include__`). If the package `inotify_simple` is
+    installed, file system events (in the directories of these files) are
+    used to wake up immediately instead. A change is only processed once the
+    files have not been modified for `debounce` seconds (e.g. while an editor
+    is still writing them). The files are only parsed if a signature changed,
+    and the callback is only called if the values of the config changed. If the file can not be read or the config can not be
+    built (e.g. due to an invalid value), the previous config is kept.
+
+    :param path: Location of the config file.
+    :param build: Function creating the config from the parsed file.
+    :param callback: Called with the new config and the changed fields
+        (mapping names to the old and new values).
+    :param interval: Time (in seconds) between two checks of the file.
+    :param debounce: Time (in seconds) the file needs to remain unchanged.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, PathLike],
+        build: Callable[[Mapping[str, Any]], Any],
+        callback: Callable[[Any, Changes], None],
+        interval: float = 1.0,
+        debounce: float = 0.2,
+    ):
+        self.path = Path(path)
+        self.build = build
+        self.callback = callback
+        self.interval = interval
+        self.debounce = debounce
+
+        self._data, self._files = read_config_file_and_sources(self.path)
+        self._signature = self._signatures(self._files)
+        self.config = build(self._data)
+
+        self._stop = threading.Event()
+        self._watched: Set[str] = set()
+        self._inotify = self._watch_events()
+        self._thread = threading.Thread(
+            target=self._run, name=f"watch {self.path}", daemon=True
+        )
+
+    def start(self) -> "ConfigWatcher":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+        if self._thread.is_alive():
+            self._thread.join()
+
+        if self._inotify is not None:
+            self._inotify.close()
+
+    def __enter__(self) -> "ConfigWatcher":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _stat(self) -> Optional[Tuple[Optional[Signature], ...]]:
+        """Return the current signatures of the files of the config."""
+        signatures: List[Optional[Signature]] = []
+
+        for path, _ in self._files:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                # e.g. replaced by a new file
+                signatures.append(None)
+            else:
+                signatures.append(
+                    (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+                )
+
+        if signatures[0] is None:
+            # the config file itself is missing
+            return None
+
+        return tuple(signatures)
+
+    @staticmethod
+    def _signatures(files: Files) -> Tuple[Optional[Signature], ...]:
+        return tuple(signature for _, signature in files)
+
+    def _watch_events(self):
+        try:
+            from inotify_simple import INotify
+        except ModuleNotFoundError:
+            return None
+
+        inotify = INotify()
+        self._watch_directories(inotify)
+        return inotify
+
+    def _watch_directories(self, inotify):
+        from inotify_simple import flags
+
+        for path, _ in self._files:
+            directory = os.path.dirname(path)
+
+            if directory in self._watched:
+                continue
+
+            # watch the directory, as files are often replaced instead of
+            # modified
+            inotify.add_watch(
+                directory,
+                flags.MODIFY
+                | flags.CLOSE_WRITE
+                | flags.MOVED_TO
+                | flags.CREATE,
+            )
+            self._watched.add(directory)
+
+    def _wait(self):
+        if self._inotify is None:
+            self._stop.wait(self.interval)
+        else:
+            self._inotify.read(timeout=int(self.interval * 1000))
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wait()
+
+            signature = self._stat()
+
+            if signature is None or signature == self._signature:
+                continue
+
+            # wait until the files are not modified any more
+            while True:
+                if self._stop.wait(self.debounce):
+                    return
+
+                current = self._stat()
+
+                if current == signature:
+                    break
+
+                signature = current
+
+            if signature is not None:
+                self._signature = signature
+                self._reload()
+
+    def _reload(self):
+        try:
+            data, files = read_config_file_and_sources(self.path)
+        except Exception as exc:  # pylint: disable=broad-except
+            logging.warning("Could not read %s: %s", self.path, exc)
+            return
+
+        # the included files may have changed as well
+        self._files = files
+        self._signature = self._signatures(files)
+
+        if self._inotify is not None:
+            self._watch_directories(self._inotify)
+
+        if data == self._data:
+            # e.g. the file was only touched
+            return
+
+        try:
+            config = self.build(data)
+        except Exception as exc:  # pylint: disable=broad-except
+            logging.warning("Could not reload %s: %s", self.path, exc)
+            return
+
+        changes = diff_configs(self.config, config)
+        self._data = data
+        self.config = config
+
+        if changes:
+            try:
+                self.callback(config, changes)
+            except Exception:  # pylint: disable=broad-except
+                logging.exception("Callback of %s failed.", self.path)
@@ -0,0 +1,262 @@
+"""Shared on-disk queue of the points of a series (for dynamic scheduling)."""
+
+import logging
+import os
+from contextlib import contextmanager
+from os import PathLike
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple, Union
+
+from .runner import RunResult, call_and_report
+
+_STATES = ("claims", "done", "failed")
+
+
+class WorkQueue:
+    """Directory based queue from which workers claim the points of a series.
+
+    Each point (identified by its index) is claimed by exclusively creating a
+    claim file, hence any number of workers (on one or many hosts sharing the
+    directory) can take part without a central service. While a point is run,
+    its claim is refreshed regularly. Claims which have not been refreshed for
+    `timeout` seconds (e.g. since the worker crashed) can be taken over by
+    other workers, i.e. a point is run at least once.
+
+    :param directory: Location of the queue.
+    :param count: Number of points in the series (all workers of a queue need
+        to agree on it).
+    :param timeout: Time (in seconds) after which a claim expires.
+    :raises: ValueError -- if the queue was created for a different series.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, PathLike],
+        count: int,
+        timeout: float = 600,
+    ):
+        self.directory = Path(directory)
+        self.count = count
+        self.timeout = timeout
+
+        for state in _STATES:
+            (self.directory / state).mkdir(parents=True, exist_ok=True)
+
+        (self.directory / "configs").mkdir(exist_ok=True)
+
+        self._check_count()
+
+    def _check_count(self):
+        import json
+        import tempfile
+
+        meta_path = self.directory / "queue.json"
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as tmp_file:
+                json.dump({"count": self.count}, tmp_file)
+
+            # linking fails if the file exists (and never exposes partial
+            # content)
+            os.link(tmp_path, meta_path)
+        except FileExistsError:
+            with open(meta_path, "r", encoding="utf-8") as meta_file:
+                count = json.load(meta_file)["count"]
+
+            if count != self.count:
+                raise ValueError(
+                    f"Queue {self.directory} holds a __series__ with {count} "
+                    f"points (instead of {self.count})."
+                )
+        finally:
+            os.unlink(tmp_path)
+
+    def _path(self, state: str, index: int) -> Path:
+        return self.directory / state / str(index)
+
+    def finished(self, index: int) -> bool:
+        return (
+            self._path("done", index).exists()
+            or self._path("failed", index).exists()
+        )
+
+    def claim(self, index: int) -> bool:
+        """Claim a point, return whether it was not claimed before."""
+        import socket
+
+        try:
+            fd = os.open(
+                self._path("claims", index),
+                os.O_WRONLY | os.O_CREAT | os.O_EXCL,
+                0o644,
+            )
+        except FileExistsError:
+            return False
+
+        try:
+            os.write(fd, f"{socket.gethostname()}:{os.getpid()}\n".encode())
+        finally:
+            os.close(fd)
+
+        return True
+
+    def claim_config(self, key: str, index: int) -> bool:
+        """Claim a config (by its fingerprint) for a point.
+
+        Returns False if the config has been claimed for a different point
+        before, i.e. the point is a duplicate. Claims of configs do not
+        expire: if the point is run again (e.g. after its claim expired), the
+        config is still claimed for it.
+        """
+        path = self.directory / "configs" / key
+
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            try:
+                return path.read_text(encoding="utf-8").strip() == str(index)
+            except FileNotFoundError:
+                return False
+
+        try:
+            os.write(fd, f"{index}\n".encode())
+        finally:
+            os.close(fd)
+
+        return True
+
+    def _is_stale(self, index: int) -> bool:
+        import time
+
+        try:
+            mtime = self._path("claims", index).stat().st_mtime
+        except FileNotFoundError:
+            return False
+
+        return time.time() - mtime > self.timeout and not self.finished(index)
+
+    def stale(self) -> List[int]:
+        """Return the points whose claims have expired."""
+        return sorted(
+            int(name)
+            for name in os.listdir(self.directory / "claims")
+            if name.isdigit() and self._is_stale(int(name))
+        )
+
+    def reclaim(self, index: int) -> bool:
+        """Take over an expired claim, return whether it succeeded."""
+        import uuid
+
+        if not self._is_stale(index):
+            return False
+
+        path = self._path("claims", index)
+        expired = path.with_name(f".{index}.{uuid.uuid4().hex}")
+
+        try:
+            # only one of the competing workers succeeds in moving the claim
+            os.rename(path, expired)
+        except FileNotFoundError:
+            return False
+
+        os.unlink(expired)
+        return self.claim(index)
+
+    def finish(self, index: int, failed: bool = False):
+        """Mark a point as done (or failed)."""
+        self._path("failed" if failed else "done", index).touch()
+
+    def skip(self, index: int):
+        """Mark a point as done without running it (e.g. a duplicate)."""
+        if self.claim(index):
+            self.finish(index)
+
+    @contextmanager
+    def heartbeat(self, index: int) -> Iterator[None]:
+        """Refresh the claim of a point while the context is active."""
+        import threading
+
+        path = self._path("claims", index)
+        stop = threading.Event()
+
+        def refresh():
+            while not stop.wait(self.timeout / 4):
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+
+        thread = threading.Thread(target=refresh, daemon=True)
+        thread.start()
+
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def status(self) -> Dict[str, int]:
+        """Return the number of pending, running, done and failed points."""
+
+        def indices(state):
+            return {
+                name
+                for name in os.listdir(self.directory / state)
+                if name.isdigit()
+            }
+
+        done = indices("done")
+        failed = indices("failed")
+        running = indices("claims") - done - failed
+
+        return {
+            "pending": self.count - len(running) - len(done) - len(failed),
+            "running": len(running),
+            "done": len(done),
+            "failed": len(failed),
+        }
+
+
+def work_on_queue(
+    queue: WorkQueue,
+    run: Callable[[int, Any, Any], None],
+    tasks: Iterable[Tuple[int, Any, Any]],
+    get_point: Callable[[int], Any],
+) -> List[RunResult]:
+    """Run the points of the queue until none are left to claim.
+
+    First, all unclaimed points are claimed (in order) and run, afterwards
+    expired claims of other workers are taken over. Failing runs do not stop
+    the worker.
+
+    :param run: Function called with the index of a point, the point and its
+        config (or None).
+    :param tasks: Index, point and (optionally) config of each point.
+    :param get_point: Function returning the point with the given index.
+    :returns: List[RunResult] -- results of the failed runs.
+    """
+    failed = []
+
+    def execute(index, point, config):
+        logging.info("__series__ run #%s/%s", index, queue.count)
+
+        with queue.heartbeat(index):
+            result = call_and_report(index, lambda: run(index, point, config))
+
+        queue.finish(index, result.failed)
+
+        if result.failed:
+            failed.append(result)
+
+    for index, point, config in tasks:
+        if queue.claim(index):
+            execute(index, point, config)
+
+    for index in queue.stale():
+        if queue.reclaim(index):
+            logging.info("Reclaimed expired __series__ run #%s.", index)
+            execute(index, get_point(index), None)
+
+    return failed
@@ -0,0 +1,51 @@
+import importlib.util
+import json
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+BENCH_PATH = Path(__file__).parents[1] / "benchmarks" / "bench.py"
+
+
+@pytest.fixture(scope="module")
+def bench():
+    spec = importlib.util.spec_from_file_location("bench", BENCH_PATH)
+    assert spec is not None and spec.loader is not None
+
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_benchmarks_run(bench, tmp_path):
+    results_path = tmp_path / "results.json"
+    args = ["--quick", "--repeat", "1", "--min-time", "0"]
+
+    result = CliRunner().invoke(bench.main, [*args, "--save", results_path])
+    assert result.exit_code == 0, result.output
+
+    with open(results_path, "r", encoding="utf-8") as results_file:
+        results = json.load(results_file)["results"]
+
+    assert "series[points=10]" in results
+    assert "read[json,fields=10]" in results
+
+    # pretend everything used to be much faster
+    baseline = {name: seconds / 10 for name, seconds in results.items()}
+
+    with open(results_path, "w", encoding="utf-8") as results_file:
+        json.dump({"results": baseline}, results_file)
+
+    result = CliRunner().invoke(
+        bench.main, [*args, "-k", "to_dict", "--compare", results_path]
+    )
+    assert result.exit_code == 1
+    assert "to_dict[fields=10]" in result.output
+
+
+def test_compare(bench):
+    baseline = {"a": 1.0, "b": 1.0}
+    results = {"a": 1.2, "b": 2.0, "c": 5.0}
+
+    assert bench.compare(results, baseline, threshold=0.25) == {"b": 2.0}
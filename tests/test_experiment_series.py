@@ -1,11 +1,25 @@
+import asyncio
 import json
+import logging
+import os
+import pickle
+import pstats
+import signal
 from dataclasses import dataclass
-from typing import List
+from pathlib import Path
+from typing import Any, List
 
+import click
+import pytest
 from click import command
 from click.testing import CliRunner
 
 from click_config import ConfigClass, click_config_options, field
+from click_config.costs import CostModel, DurationLog
+from click_config.events import Event, JsonLinesObserver, LoggingObserver
+from click_config.memo import RunCache
+from click_config.runner import run_concurrently
+from click_config.workqueue import WorkQueue
 
 
 def test_experiment_series(request, tmp_path):
@@ -78,3 +92,913 @@ def test_experiment_series(request, tmp_path):
 
     for exp in experiments:
         assert (exp["a"],) + tuple(exp["c"]) in expected_combinations
+
+
+def test_parallel_series(tmp_path):
+    @dataclass
+    class Config(ConfigClass):
+        a: int
+        b: str = "test"
+
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+
+    @command()
+    @click_config_options(Config, jobs=2)
+    def func(config):
+        if config.a == 3:
+            raise ValueError("a must not be 3")
+
+        # forked workers do not share the captured stdout: write to files
+        with open(out_dir / f"{config.a}.json", "w", encoding="utf-8") as f:
+            json.dump(config.to_dict(), f)
+
+    conf_file = tmp_path / "config.json"
+
+    with open(conf_file, "w", encoding="utf-8") as f:
+        json.dump({"__series__": {"a": [0, 1, 2, 3, 4]}}, f)
+
+    runner = CliRunner()
+    result = runner.invoke(func, ["--config", str(conf_file)])
+
+    # the failing run is reported, but does not stop the remaining runs
+    assert result.exit_code != 0, result.output
+    assert "1 of 5 __series__ runs failed" in result.output
+    assert "a must not be 3" in result.output
+
+    assert sorted(int(p.stem) for p in out_dir.iterdir()) == [0, 1, 2, 4]
+
+    # with a single job, the series is run sequentially in-process
+    result = runner.invoke(func, ["--jobs", "1", "--config", str(conf_file)])
+    assert isinstance(result.exception, ValueError)
+
+
+def test_lazy_series(tmp_path):
+    events = []
+
+    @dataclass
+    class Config(ConfigClass):
+        a: int
+
+        def __post_init__(self):
+            events.append(("build", self.a))
+
+            if self.a < 0:
+                raise ValueError("a must not be negative")
+
+    @command()
+    @click_config_options(Config)
+    def func(config):
+        events.append(("run", config.a))
+
+    conf_file = tmp_path / "config.json"
+
+    with open(conf_file, "w", encoding="utf-8") as f:
+        json.dump({"__series__": {"a": [0, 1, -1]}}, f)
+
+    runner = CliRunner()
+    result = runner.invoke(func, ["--config", str(conf_file)])
+
+    # each config is built right before it is run
+    assert isinstance(result.exception, ValueError)
+    assert events == [
+        ("build", 0),
+        ("run", 0),
+        ("build", 1),
+        ("run", 1),
+        ("build", -1),
+    ]
+
+    @command()
+    @click_config_options(Config, validate_series=True)
+    def validated_func(config):
+        events.append(("run", config.a))
+
+    events.clear()
+    result = runner.invoke(validated_func, ["--config", str(conf_file)])
+
+    # the invalid config is detected before the first run
+    assert result.exit_code == 2
+    assert "Invalid __series__ configuration #2" in result.output
+    assert ("run", 0) not in events
+
+
+def test_series_index(tmp_path):
+    @dataclass
+    class Config(ConfigClass):
+        a: int
+        c: str
+        d: str = "-"
+
+    @command()
+    @click_config_options(Config)
+    def func(config):
+        print(json.dumps(config.to_dict()))
+
+    conf_file = tmp_path / "config.json"
+
+    with open(conf_file, "w", encoding="utf-8") as f:
+        json.dump({"__series__": {"a": [0, 1, 2], "c": ["x", "y"]}}, f)
+
+    runner = CliRunner()
+
+    result = runner.invoke(func, ["--series-count", "--config", conf_file])
+    assert result.exit_code == 0
+    assert result.output.strip() == "6"
+
+    # points are decoded in the same order as they are iterated over
+    expected = [(a, c) for a in [0, 1, 2] for c in ["x", "y"]]
+
+    for index, (a, c) in enumerate(expected):
+        result = runner.invoke(
+            func, ["--series-index", str(index), "--config", conf_file]
+        )
+
+        assert result.exit_code == 0
+        assert json.loads(result.output) == {"a": a, "c": c, "d": "-"}
+
+    result = runner.invoke(
+        func, ["--series-index", "6", "--config", conf_file]
+    )
+    assert result.exit_code == 2
+
+
+def test_shards(tmp_path):
+    @dataclass
+    class Config(ConfigClass):
+        a: int
+
+    @command()
+    @click_config_options(Config)
+    def func(config):
+        print(config.a)
+
+    conf_file = tmp_path / "config.json"
+
+    with open(conf_file, "w", encoding="utf-8") as f:
+        json.dump({"__series__": {"a": list(range(10))}}, f)
+
+    runner = CliRunner()
+
+    for mode, expected in [
+        ("contiguous", [[0, 1, 2], [3, 4, 5], [6, 7, 8, 9]]),
+        ("strided", [[0, 3, 6, 9], [1, 4, 7], [2, 5, 8]]),
+    ]:
+        for i in range(3):
+            result = runner.invoke(
+                func,
+                [
+                    "--shard",
+                    f"{i}/3",
+                    "--shard-mode",
+                    mode,
+                    "--config",
+                    conf_file,
+                ],
+            )
+
+            assert result.exit_code == 0
+            assert [int(a) for a in result.output.split()] == expected[i]
+
+    result = runner.invoke(func, ["--shard", "3/3", "--config", conf_file])
+    assert result.exit_code == 2
+
+
+def test_resume(tmp_path):
+    @dataclass
+    class Config(ConfigClass):
+        a: int
+
+    crash_at = [2]
+
+    @command()
+    @click_config_options(Config)
+    def func(config):
+        if config.a == crash_at[0]:
+            raise RuntimeError("crashed")
+        print(config.a)
+
+    conf_file = tmp_path / "config.json"
+
+    with open(conf_file, "w", encoding="utf-8") as f:
+        json.dump({"__series__": {"a": [0, 1, 2, 3]}}, f)
+
+    runner = CliRunner()
+
+    result = runner.invoke(func, ["--resume", "--config", str(conf_file)])
+    assert isinstance(result.exception, RuntimeError)
+    assert result.output.split() == ["0", "1"]
+
+    # simulate a write which was interrupted by a killed process
+    with open(f"{conf_file}.func.manifest", "a", encoding="utf-8") as f:
+        f.write("0123abc")
+
+    # second run continues where the first one crashed
+    crash_at[0] = -1
+    result = runner.invoke(func, ["--resume", "--config", str(conf_file)])
+    assert result.exit_code == 0
+    assert result.output.split() == ["2", "3"]
+
+    # everything is done
+    result = runner.invoke(func, ["--resume", "--config", str(conf_file)])
+    assert result.exit_code == 0
+    assert result.output.split() == []
+
+    # without --resume, all runs are executed
+    result = runner.invoke(func, ["--config", str(conf_file)])
+    assert result.output.split() == ["0", "1", "2", "3"]
+
+    @command()
+    @click_config_options(Config)
+    def evaluate(config):
+        print(config.a)
+
+    # other commands reading the same file keep their own manifest
+    result = runner.invoke(evaluate, ["--resume", "--config", str(conf_file)])
+    assert result.output.split() == ["0", "1", "2", "3"]
+
+
+def test_series_duplicates(tmp_path, caplog):
+    @dataclass
+    class Config(ConfigClass):
+        a: int
+        b: str = "-"
+        path: Path = Path(".")
+
+    @command()
+    @click_config_options(Config)
+    def func(config):
+        print(json.dumps([config.a, config.b, str(config.path)]))
+
+    conf_file = tmp_path / "config.json"
+
+    with open(conf_file, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "__series__": {
+                    "a": [0, 1, 2],
+                    "b": ["x", "x", "y"],
+                    "path": ["p", "./p"],
+                }
+            },
+            f,
+        )
+
+    runner = CliRunner()
+
+    with caplog.at_level(logging.INFO):
+        result = runner.invoke(func, ["--a", "5", "--config", str(conf_file)])
+
+    assert result.exit_code == 0
+
+    # overwritten axis and repeated values are dropped before expansion
+    runs = [json.loads(line) for line in result.output.splitlines()]
+    assert runs == [[5, "x", "p"], [5, "x", "p"], [5, "y", "p"], [5, "y", "p"]]
+
+    assert "Removed 14 duplicate __series__ points" in caplog.text
+    caplog.clear()
+
+    # configs which are identical after conversion are collapsed on request
+    with caplog.at_level(logging.INFO):
+        result = runner.invoke(
+            func,
+            ["--a", "5", "--skip-duplicates", "--config", str(conf_file)],
+        )
+
+    runs = [json.loads(line) for line in result.output.splitlines()]
+    assert runs == [[5, "x", "p"], [5, "y", "p"]]
+
+    assert "Removed 2 duplicate __series__ points." in caplog.text
+
+
+def test_series_constraints(tmp_path):
+    @dataclass
+    class Config(ConfigClass):
+        a: int
+        b: int
+
+    @command()
+    @click_config_options(
+        Config, constraints=[lambda point: point["a"] < point["b"]]
+    )
+    def func(config):
+        print(config.a, config.b)
+
+    conf_file = tmp_path / "config.json"
+
+    with open(conf_file, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "__series__": {
+                    "a": [0, 1, 2],
+                    "b": [0, 1, 2],
+                    "__exclude__": [{"a": 0, "b": 2}],
+                }
+            },
+            f,
+        )
+
+    runner = CliRunner()
+    result = runner.invoke(func, ["--config", str(conf_file)])
+
+    assert result.exit_code == 0
+    assert result.output.splitlines() == ["0 1", "1 2"]
+
+    result = runner.invoke(func, ["--series-count", "--config", conf_file])
+    assert result.output.strip() == "2"
+
+
+def test_run_cache(tmp_path):
+    @dataclass
+    class Config(ConfigClass):
+        a: int
+
+    cache_dir = tmp_path / "cache"
+
+    @command()
+    @click_config_options(Config, cache_dir=cache_dir)
+    def func(config):
+        print(config.a)
+        return config.a * 10
+
+    conf_file = tmp_path / "config.json"
+
+    with open(conf_file, "w", encoding="utf-8") as f:
+        json.dump({"__series__": {"a": [0, 1]}}, f)
+
+    runner = CliRunner()
+
+    result = runner.invoke(func, ["--config", str(conf_file)])
+    assert result.output.split() == ["0", "1"]
+
+    # overlapping grid: only the new point is run
+    with open(conf_file, "w", encoding="utf-8") as f:
+        json.dump({"__series__": {"a": [0, 1, 2]}}, f)
+
+    result = runner.invoke(func, ["--config", str(conf_file)])
+    assert result.exit_code == 0
+    assert result.output.split() == ["2"]
+
+    result = runner.invoke(func, ["--no-cache", "--config", str(conf_file)])
+    assert result.output.split() == ["0", "1", "2"]
+
+    # return values are stored
+    results = sorted(
+        pickle.loads(path.read_bytes()) for path in cache_dir.glob("*/*")
+    )
+    assert results == [0, 10, 20]
+
+
+def test_run_cache_commands(tmp_path):
+    @dataclass
+    class Config(ConfigClass):
+        a: int
+
+    cache_dir = tmp_path / "cache"
+
+    @command()
+    @click_config_options(Config, cache_dir=cache_dir)
+    def train(config):
+        print("train", config.a)
+
+    @command()
+    @click_config_options(Config, cache_dir=cache_dir)
+    def evaluate(config):
+        print("evaluate", config.a)
+
+    @command()
+    @click.option("--log", type=click.File("w"), default="-")
+    @click_config_options(Config, cache_dir=cache_dir)
+    def log(config, log):
+        print(config.a, file=log)
+
+    runner = CliRunner()
+
+    # commands sharing a cache directory do not skip each others runs
+    for cmd in (train, evaluate):
+        result = runner.invoke(cmd, ["--a", "1"])
+        assert result.output.strip() == f"{cmd.name} 1"
+
+    for cmd in (train, evaluate):
+        result = runner.invoke(cmd, ["--a", "1"])
+        assert result.exit_code == 0
+        assert result.output == ""
+
+    # options which can not be part of the key
+    result = runner.invoke(log, ["--a", "1"])
+    assert result.exit_code == 2
+    assert "The value of 'log' can not be part" in result.output
+
+    result = runner.invoke(log, ["--no-cache", "--a", "1"])
+    assert result.exit_code == 0
+    assert result.output.strip() == "1"
+
+
+def test_run_cache_eviction(tmp_path):
+    size = len(pickle.dumps(b"x" * 20, protocol=pickle.HIGHEST_PROTOCOL))
+    cache = RunCache(tmp_path, max_bytes=3 * size)
+
+    for i in range(10):
+        key = f"{i:02d}" * 32
+        cache.put(key, b"x" * 20)
+        os.utime(cache.path(key), (i, i))
+
+    cache.prune()
+
+    # least recently used results are removed
+    assert [cache.get(f"{i:02d}" * 32)[0] for i in range(10)] == [
+        False
+    ] * 7 + [True] * 3
+
+    # result points to an artifact which has been removed
+    artifact = tmp_path / "artifact"
+    artifact.touch()
+    cache.put("ab" * 32, artifact)
+    assert cache.get("ab" * 32) == (True, artifact)
+
+    artifact.unlink()
+    assert cache.get("ab" * 32) == (False, None)
+
+    cache = RunCache(tmp_path, max_age=60)
+    cache.put("cd" * 32, 1)
+    os.utime(cache.path("cd" * 32), (0, 0))
+    assert cache.get("cd" * 32) == (False, None)
+
+    cache.prune()
+    assert not cache.path("cd" * 32).exists()
+    assert not list(tmp_path.glob("*/.*.tmp"))
+
+
+def test_work_queue(tmp_path):
+    @dataclass
+    class Config(ConfigClass):
+        a: int
+
+    @command()
+    @click_config_options(Config)
+    def func(config):
+        if config.a == 1:
+            raise RuntimeError("crashed")
+        print(config.a)
+
+    conf_file = tmp_path / "config.json"
+
+    with open(conf_file, "w", encoding="utf-8") as f:
+        json.dump({"__series__": {"a": [0, 1, 2, 3]}}, f)
+
+    queue_dir = tmp_path / "queue"
+    args = ["--queue", str(queue_dir), "--config", str(conf_file)]
+
+    # another worker claimed point 2 and crashed while running it
+    queue = WorkQueue(queue_dir, 4, timeout=60)
+    assert queue.claim(2)
+    os.utime(queue_dir / "claims" / "2", (0, 0))
+
+    runner = CliRunner()
+
+    result = runner.invoke(func, ["--queue-status", *args])
+    assert result.output.split("\n")[:4] == [
+        "pending: 3",
+        "running: 1",
+        "done: 0",
+        "failed: 0",
+    ]
+
+    result = runner.invoke(func, args)
+    assert result.exit_code == 1
+    assert "1 of 4 __series__ runs failed" in result.output
+    # the expired claim is run last
+    assert result.stdout.split() == ["0", "3", "2"]
+
+    result = runner.invoke(func, ["--queue-status", *args])
+    assert result.output.split("\n")[:4] == [
+        "pending: 0",
+        "running: 0",
+        "done: 3",
+        "failed: 1",
+    ]
+
+    # nothing left to do for further workers
+    result = runner.invoke(func, args)
+    assert result.exit_code == 0
+    assert result.output == ""
+
+    # queue belongs to a different series
+    with open(conf_file, "w", encoding="utf-8") as f:
+        json.dump({"__series__": {"a": [0, 1]}}, f)
+
+    result = runner.invoke(func, args)
+    assert result.exit_code == 2
+
+
+def test_work_queue_duplicates(tmp_path):
+    built = []
+
+    @dataclass
+    class Config(ConfigClass):
+        a: int
+        path: Path = Path(".")
+
+        def __post_init__(self):
+            built.append(self.a)
+
+    @command()
+    @click_config_options(Config, skip_duplicates=True)
+    def func(config):
+        print(config.a, config.path)
+
+    conf_file = tmp_path / "config.json"
+
+    with open(conf_file, "w", encoding="utf-8") as f:
+        json.dump({"__series__": {"a": [0, 1], "path": ["p", "./p"]}}, f)
+
+    queue_dir = tmp_path / "queue"
+
+    # another worker ran the first point
+    queue = WorkQueue(queue_dir, 4)
+    assert queue.claim(0)
+    assert queue.claim_config(Config(0, Path("p")).fingerprint(), 0)
+    queue.finish(0)
+    built.clear()
+
+    runner = CliRunner()
+    result = runner.invoke(
+        func, ["--queue", str(queue_dir), "--config", str(conf_file)]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert result.output.splitlines() == ["1 p"]
+
+    # configs are only built once their point has been claimed
+    assert built == [0, 1, 1]
+    assert queue.status()["done"] == 4
+
+
+def test_work_queue_claims(tmp_path):
+    queue = WorkQueue(tmp_path, 3, timeout=60)
+
+    assert queue.claim(0)
+    assert not queue.claim(0)
+
+    # claims are only taken over once they expired
+    assert not queue.reclaim(0)
+
+    with queue.heartbeat(0):
+        pass
+
+    os.utime(tmp_path / "claims" / "0", (0, 0))
+    assert queue.stale() == [0]
+    assert queue.reclaim(0)
+    assert queue.stale() == []
+
+    queue.skip(1)
+    assert queue.finished(1)
+    assert queue.status() == {
+        "pending": 1,
+        "running": 1,
+        "done": 1,
+        "failed": 0,
+    }
+
+
+def test_cost_model():
+    log = [
+        {"key": "a", "point": {"x": 0, "y": "sgd"}, "seconds": 1.0},
+        {"key": "a", "point": {"x": 0, "y": "sgd"}, "seconds": 3.0},
+        {"key": "b", "point": {"x": 1, "y": "adam"}, "seconds": 10.0},
+    ]
+    model = CostModel(log)
+
+    assert model.estimate("a", {}) == 2.0
+    # nearest neighbor (sharing the most values)
+    assert model.estimate("c", {"x": 1, "y": "sgd", "z": 0}) == 6.0
+    assert model.estimate("d", {"x": 2, "y": "adam"}) == 10.0
+    assert model.estimate("e", {"x": 5}) == 6.0
+
+    tasks = [(0, {"x": 0, "y": "sgd"}, "a"), (1, {"x": 2, "y": "adam"}, "d")]
+    assert model.longest_first(tasks) == [1, 0]
+
+    # only the given fields are compared
+    model = CostModel(log, keys=["x"])
+    assert model.estimate(None, {"x": 1, "y": "sgd"}) == 10.0
+    assert model.estimate(None, {"x": 2, "y": "sgd"}) == 6.0
+
+    assert not CostModel([])
+
+
+def test_longest_first(tmp_path):
+    @dataclass
+    class Config(ConfigClass):
+        a: int
+
+    durations = tmp_path / "durations.jsonl"
+
+    @command()
+    @click_config_options(Config, durations=durations)
+    def func(config):
+        print(config.a)
+
+    conf_file = tmp_path / "config.json"
+
+    with open(conf_file, "w", encoding="utf-8") as f:
+        json.dump({"__series__": {"a": [0, 1, 2]}}, f)
+
+    runner = CliRunner()
+    args = ["--config", str(conf_file)]
+
+    result = runner.invoke(func, ["--queue", str(tmp_path / "q1"), *args])
+    assert result.output.split() == ["0", "1", "2"]
+
+    records = DurationLog(durations).read()
+    assert [record["point"] for record in records] == [
+        {"a": 0},
+        {"a": 1},
+        {"a": 2},
+    ]
+
+    # pretend later points took longer
+    durations.unlink()
+
+    for record, seconds in zip(records, [1.0, 2.0, 100.0]):
+        DurationLog(durations).add(record["key"], record["point"], seconds)
+
+    result = runner.invoke(func, ["--queue", str(tmp_path / "q2"), *args])
+    assert result.output.split() == ["2", "1", "0"]
+
+
+def test_async_series(tmp_path):
+    @dataclass
+    class Config(ConfigClass):
+        a: int
+
+    running = []
+    max_running = [0]
+
+    @command()
+    @click_config_options(Config, concurrency=2)
+    async def func(config):
+        running.append(config.a)
+        max_running[0] = max(max_running[0], len(running))
+        await asyncio.sleep(0.01)
+        running.remove(config.a)
+
+        if config.a == 3:
+            raise RuntimeError("failed")
+        print(config.a)
+
+    conf_file = tmp_path / "config.json"
+
+    with open(conf_file, "w", encoding="utf-8") as f:
+        json.dump({"__series__": {"a": [0, 1, 2, 3, 4]}}, f)
+
+    runner = CliRunner()
+
+    result = runner.invoke(func, ["--config", str(conf_file)])
+    assert result.exit_code == 1
+    assert "1 of 5 __series__ runs failed" in result.output
+    assert sorted(result.stdout.split()) == ["0", "1", "2", "4"]
+    assert max_running[0] == 2
+
+    max_running[0] = 0
+    result = runner.invoke(
+        func, ["--concurrency", "1", "--a", "0", "--config", str(conf_file)]
+    )
+    assert result.exit_code == 0
+    assert result.output.split() == ["0"]
+    assert max_running[0] == 1
+
+
+def test_async_cancellation():
+    cancelled = []
+
+    async def run(item):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(item)
+            raise
+
+    async def main():
+        task = asyncio.ensure_future(
+            run_concurrently(run, enumerate("abcd"), 4, concurrency=2)
+        )
+        await asyncio.sleep(0.01)
+        task.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+
+    # pending runs are cancelled, remaining items are never started
+    assert sorted(cancelled) == ["a", "b"]
+
+
+def test_isolated_series(tmp_path):
+    @dataclass
+    class Config(ConfigClass):
+        a: int
+
+    leaked = []
+
+    @command()
+    @click_config_options(Config, isolate=True, preload=["json"])
+    def func(config):
+        if config.a == 1:
+            raise RuntimeError("failed")
+        if config.a == 2:
+            os.kill(os.getpid(), signal.SIGKILL)
+
+        leaked.append(config.a)
+
+        with open(tmp_path / f"{config.a}.txt", "w", encoding="utf-8") as f:
+            f.write(f"{os.getpid()} {len(leaked)}")
+
+    conf_file = tmp_path / "config.json"
+
+    with open(conf_file, "w", encoding="utf-8") as f:
+        json.dump({"__series__": {"a": [0, 1, 2, 3]}}, f)
+
+    result = CliRunner().invoke(func, ["--config", str(conf_file)])
+    assert result.exit_code == 1
+    assert "2 of 4 __series__ runs failed" in result.output
+    assert "run #1 (exit status 1, peak RSS" in result.output
+    assert "RuntimeError: failed" in result.output
+    assert "Run was killed by SIGKILL." in result.output
+
+    # each run started from a clean state, in its own process
+    outputs = [(tmp_path / f"{a}.txt").read_text().split() for a in (0, 3)]
+    assert outputs[0][1] == outputs[1][1] == "1"
+    assert outputs[0][0] != outputs[1][0] != str(os.getpid())
+    assert leaked == []
+
+    # without isolation, runs share the process
+    result = CliRunner().invoke(
+        func, ["--no-isolate", "--a", "0", "--config", str(conf_file)]
+    )
+    assert result.exit_code == 0
+    assert leaked == [0]
+
+
+def test_observer(tmp_path, caplog):
+    @dataclass
+    class Config(ConfigClass):
+        a: int
+
+    events: List[Event] = []
+
+    @command()
+    @click_config_options(Config, observer=events.append)
+    def func(config):
+        if config.a == 1:
+            raise RuntimeError("failed")
+
+    conf_file = tmp_path / "config.json"
+
+    with open(conf_file, "w", encoding="utf-8") as f:
+        json.dump({"__series__": {"a": [0, 1]}}, f)
+
+    result = CliRunner().invoke(func, ["--config", str(conf_file)])
+    assert isinstance(result.exception, RuntimeError)
+
+    assert [(event.phase, event.index) for event in events] == [
+        ("read", None),
+        ("expand", None),
+        ("build", 0),
+        ("run", 0),
+        ("build", 1),
+        ("run", 1),
+    ]
+    assert events[0].info == {"path": str(conf_file)}
+    assert events[1].info == {"points": 2}
+    assert events[2].fingerprint == events[3].fingerprint
+    assert events[3].fingerprint == Config(a=0).fingerprint()
+    assert events[3].error is None
+    assert events[5].error == "RuntimeError('failed')"
+    assert all(event.seconds >= 0 for event in events)
+
+    # events as json lines and log records
+    events_file = tmp_path / "events.jsonl"
+    log_observer = LoggingObserver()
+    json_observer = JsonLinesObserver(events_file)
+
+    def observer(event):
+        log_observer(event)
+        json_observer(event)
+
+    func = command()(
+        click_config_options(Config, observer=observer)(lambda config: None)
+    )
+
+    with caplog.at_level(logging.DEBUG, logger="click_config.events"):
+        result = CliRunner().invoke(func, ["--a", "3"])
+
+    assert result.exit_code == 0
+    records = [
+        record.event
+        for record in caplog.records
+        if record.name == "click_config.events"
+    ]
+    lines = [json.loads(line) for line in events_file.read_text().splitlines()]
+
+    assert [record["phase"] for record in records] == [
+        "expand",
+        "build",
+        "run",
+    ]
+    assert lines == records
+
+
+def test_observer_unfingerprintable(tmp_path):
+    @dataclass
+    class Config(ConfigClass):
+        out: Any = field(type=click.File("w"), default="-")
+
+    events: List[Event] = []
+
+    @command()
+    @click_config_options(Config, observer=events.append)
+    def func(config):
+        config.out.write("done")
+
+    result = CliRunner().invoke(func, ["--out", str(tmp_path / "out.txt")])
+    assert result.exit_code == 0, result.output
+    assert (tmp_path / "out.txt").read_text() == "done"
+
+    assert [event.phase for event in events] == ["expand", "build", "run"]
+    assert all(event.fingerprint is None for event in events)
+
+
+def test_profile(tmp_path):
+    @dataclass
+    class Config(ConfigClass):
+        a: int
+
+    def allocate(n):
+        return [bytearray(1000) for _ in range(n)]
+
+    kept = []
+
+    @command()
+    @click_config_options(Config, profile=True)
+    def func(config):
+        kept.append(allocate(100 * (config.a + 1)))
+
+    conf_file = tmp_path / "config.json"
+
+    with open(conf_file, "w", encoding="utf-8") as f:
+        json.dump({"__series__": {"a": [0, 1]}}, f)
+
+    profile_dir = tmp_path / "profiles"
+
+    args = [
+        "--profile",
+        str(profile_dir),
+        "--profile-mode",
+        "all",
+        "--config",
+        str(conf_file),
+    ]
+    result = CliRunner().invoke(func, args)
+    assert result.exit_code == 0, result.output
+
+    # profiles of an earlier invocation are not merged
+    (previous,) = profile_dir.iterdir()
+    result = CliRunner().invoke(func, args)
+    assert result.exit_code == 0, result.output
+
+    (run_dir,) = set(profile_dir.iterdir()) - {previous}
+
+    for a in (0, 1):
+        prefix = f"run-{a}-{Config(a=a).fingerprint()[:12]}"
+        assert (run_dir / f"{prefix}.prof").exists()
+
+        report = (run_dir / f"{prefix}.alloc.txt").read_text()
+        assert "peak traced memory" in report
+        assert "test_experiment_series.py" in report
+
+    stats = pstats.Stats(str(run_dir / "merged.prof"))
+    calls = {
+        function: stat[1]
+        for (_, _, function), stat in stats.stats.items()  # type: ignore
+    }
+    assert calls["allocate"] == 2
+
+
+def test_profile_unfingerprintable(tmp_path):
+    @dataclass
+    class Config(ConfigClass):
+        out: Any = field(type=click.File("w"), default="-")
+
+    @command()
+    @click_config_options(Config, profile=True)
+    def func(config):
+        config.out.write("done")
+
+    profile_dir = tmp_path / "profiles"
+    args = ["--profile", str(profile_dir), "--out", str(tmp_path / "out.txt")]
+    result = CliRunner().invoke(func, args)
+    assert result.exit_code == 0, result.output
+
+    (run_dir,) = profile_dir.iterdir()
+    assert (run_dir / "run-0.prof").exists()
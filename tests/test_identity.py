@@ -0,0 +1,100 @@
+import subprocess
+import sys
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path, PurePosixPath
+from typing import Dict, Optional, Tuple
+
+import pytest
+
+from click_config import ConfigClass, fingerprint
+from click_config.identity import canonicalize
+
+
+@dataclass(frozen=True)
+class FrozenConfig(ConfigClass):
+    path: Path = Path("data")
+    sizes: Tuple[int, ...] = (1, 2)
+    weights: Optional[Dict[str, float]] = None
+    rate: float = 0.1
+
+
+def test_fingerprint_stable():
+    config = FrozenConfig(weights={"b": 1.0, "a": 0.5})
+
+    # independent of the key order and the type of sequence
+    assert config.fingerprint() == fingerprint(
+        FrozenConfig(
+            sizes=[1, 2],  # type: ignore[arg-type]
+            weights={"a": 0.5, "b": 1.0},
+        )
+    )
+    assert config.fingerprint() != FrozenConfig(rate=0.2).fingerprint()
+
+    # identical in a different process
+    code = (
+        "from tests.test_identity import FrozenConfig;"
+        "print(FrozenConfig(weights={'a': 0.5, 'b': 1.0}).fingerprint())"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=Path(__file__).parents[1],
+        env={"PYTHONHASHSEED": "123"},
+    ).stdout
+
+    assert output.strip() == config.fingerprint()
+
+
+def test_fingerprint_memoized(sample_dataclass_config):
+    config = FrozenConfig()
+    key = config.fingerprint()
+
+    assert config.__dict__["__click_config_fingerprint__"] == key
+    assert config == FrozenConfig()
+
+    # mutable configs are hashed on every call
+    mutable = sample_dataclass_config(a=1)
+    key = fingerprint(mutable)
+    mutable.a = 2
+
+    assert fingerprint(mutable) != key
+
+    with pytest.raises(TypeError):
+        fingerprint({"a": 1})
+
+
+def test_canonicalize():
+    assert canonicalize(PurePosixPath("a/b")) == {"__path__": "a/b"}
+    assert canonicalize({1: "x", 0: "y"}) == {
+        "__items__": [[0, "y"], [1, "x"]]
+    }
+    assert canonicalize({"b", "a"}) == {"__set__": ["a", "b"]}
+    assert canonicalize(FrozenConfig()) == {
+        "path": {"__path__": "data"},
+        "sizes": [1, 2],
+        "weights": None,
+        "rate": 0.1,
+    }
+
+
+def test_canonicalize_custom_types():
+    class Opaque:
+        pass
+
+    class Point:
+        def __init__(self, x):
+            self.x = x
+
+        def __fingerprint__(self):
+            return {"x": self.x}
+
+    # the default repr contains the memory address of the object
+    with pytest.raises(TypeError, match="Opaque"):
+        canonicalize({"value": Opaque()})
+
+    assert canonicalize([Point(1)]) == canonicalize([Point(1)]) == [{"x": 1}]
+    assert canonicalize(date(2024, 1, 2)) == {"__datetime__": "2024-01-02"}
+    assert canonicalize(b"\x01") == {"__bytes__": "01"}
@@ -0,0 +1,72 @@
+import subprocess
+import sys
+
+# budget (in microseconds) for importing the package (including click)
+IMPORT_TIME_BUDGET = 150_000
+
+# modules which are only required for some features
+DEFERRED_MODULES = [
+    "docstring_parser",
+    "multiprocessing",
+    "concurrent.futures",
+    "yaml",
+    "toml",
+]
+
+
+def import_times(statement):
+    """Return cumulative import time (in us) of each top-level import."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    times = {}
+
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+
+        _, cumulative, name = line.split("|")
+
+        try:
+            cumulative_time = int(cumulative)
+        except ValueError:
+            continue  # header
+
+        if not name.startswith("  "):
+            # top level import
+            times[name.strip()] = cumulative_time
+
+    return times
+
+
+def test_import_time():
+    # modules imported on interpreter startup
+    startup = import_times("pass")
+
+    times = import_times("from click_config import click_config_options")
+
+    package_time = sum(
+        time for name, time in times.items() if name not in startup
+    )
+
+    assert package_time < IMPORT_TIME_BUDGET
+
+
+def test_deferred_imports():
+    statement = (
+        "import sys; import click_config.core; "
+        f"print([m for m in {DEFERRED_MODULES!r} if m in sys.modules])"
+    )
+
+    result = subprocess.run(
+        [sys.executable, "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert result.stdout.strip() == "[]"
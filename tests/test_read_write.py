@@ -1,8 +1,30 @@
 import json
+import math
+import os
+import pickle
+import queue
+from pathlib import Path
 
 import pytest
 from click.testing import CliRunner
 
+from click_config import util
+from click_config.core import InvalidRecord
+from click_config.util import (
+    CompositionError,
+    ConfigFileCache,
+    disable_config_cache,
+    enable_config_cache,
+    get_loader,
+    get_read_handler,
+    get_writer,
+    merge_configs,
+    read_config_file,
+    read_config_file_and_sources,
+    register_format,
+    write_config_file,
+)
+
 _test_conf_files = {
     # config using yaml format
     "yaml": """
@@ -13,6 +35,11 @@ c: [x, y]
     "toml": """
 a = 2
 c = [ "x", "y" ]
+""",
+    # yaml using the short extension
+    "yml": """
+a: 2
+c: [x, y]
 """,
     # config using json format
     "json": """
@@ -77,3 +104,318 @@ def test_config_file(config_type, request, tmp_path, extension):
     assert output["a"] == 1
     assert output["b"] == "test"
     assert output["c"] == ["x", "y"]
+
+
+def test_from_jsonl(sample_config_child_class, tmp_path):
+    path = tmp_path / "configs.jsonl"
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"a": 1}\n\n{"a": 2, "c": ["x"]}\n{"b": "no a"}\n{"a": 3\n')
+
+    with pytest.raises(InvalidRecord) as exc_info:
+        sample_config_child_class.from_jsonl(path)
+
+    assert exc_info.value.location == "line 4"
+
+    configs = sample_config_child_class.from_jsonl(
+        path, overwrite={"b": "x"}, skip_invalid=True
+    )
+
+    assert [(c.a, c.b, c.c) for c in configs] == [
+        (1, "x", ["z"]),
+        (2, "x", ["x"]),
+    ]
+
+    # lazily created configs
+    configs = sample_config_child_class.from_jsonl(path, lazy=True)
+    assert next(configs).a == 1
+    assert next(configs).a == 2
+
+    with pytest.raises(InvalidRecord):
+        next(configs)
+
+
+def test_from_records(sample_config_child_class):
+    configs = sample_config_child_class.from_records([{"a": 1}, {"a": 2}])
+    assert [c.a for c in configs] == [1, 2]
+
+    with pytest.raises(InvalidRecord) as exc_info:
+        sample_config_child_class.from_records([{"a": 1}, [1, 2]])
+
+    assert exc_info.value.location == "record #1"
+
+
+def test_config_cache(tmp_path):
+    conf_file = tmp_path / "config.json"
+    conf_file.write_text('{"a": 1, "__series__": {"a": [1, 2]}}')
+
+    other_file = tmp_path / "other.json"
+    other_file.write_text('{"a": 2}')
+
+    loaded = []
+
+    def load(path):
+        loaded.append(path)
+        return read_config_file(path)
+
+    cache = ConfigFileCache(max_entries=1)
+
+    data = cache.read(conf_file, load)
+    data.pop("__series__")
+
+    # cached data is not affected by modifications of returned data
+    assert cache.read(conf_file, load) == {"a": 1, "__series__": {"a": [1, 2]}}
+    assert len(loaded) == 1
+
+    # changed files are read again
+    conf_file.write_text('{"a": 10}')
+    assert cache.read(conf_file, load) == {"a": 10}
+    assert len(loaded) == 2
+
+    # least recently used entries are evicted
+    cache.read(other_file, load)
+    assert len(cache) == 1
+    cache.read(conf_file, load)
+    assert len(loaded) == 4
+
+
+def test_enable_config_cache(sample_config_child_class, tmp_path):
+    conf_file = tmp_path / "config.json"
+    conf_file.write_text('{"a": 1}')
+
+    cache = enable_config_cache()
+
+    try:
+        assert sample_config_child_class.from_file(conf_file).a == 1
+        assert len(cache) == 1
+    finally:
+        disable_config_cache()
+
+
+def test_register_format(sample_config_child_class, tmp_path):
+    register_format(["pkl"], pickle.load, pickle.dump, binary=True)
+
+    config = sample_config_child_class(a=1, c=["x"])
+    config.to_file(tmp_path / "config.pkl")
+
+    assert (
+        sample_config_child_class.from_file(tmp_path / "config.pkl") == config
+    )
+
+    with pytest.raises(RuntimeError):
+        read_config_file(tmp_path / "config.unknown")
+
+
+@pytest.mark.parametrize("extension", ["json", "toml", "yaml"])
+def test_text_mode_loader(tmp_path, extension):
+    path = tmp_path / f"config.{extension}"
+
+    # the functions accept files opened in text mode, whatever the backend
+    with open(path, "w", encoding="utf-8") as conf_file:
+        get_writer(extension)({"a": 1, "c": ["ä"]}, conf_file)
+
+    with open(path, "r", encoding="utf-8") as conf_file:
+        assert get_loader(extension)(conf_file) == {"a": 1, "c": ["ä"]}
+
+    handler = get_read_handler(extension)
+
+    with open(path, "rb" if handler.binary else "r") as conf_file:
+        assert handler.func(conf_file) == {"a": 1, "c": ["ä"]}
+
+
+def test_json_values(tmp_path):
+    path = tmp_path / "config.json"
+    data = {"lr": float("inf"), "seed": 2**70, "digits": "1" * 20, "n": 1}
+
+    write_config_file(path, data)
+    assert read_config_file(path) == data
+
+    path.write_text('{"lr": NaN}')
+    assert math.isnan(read_config_file(path)["lr"])
+
+    path.write_text('{"lr": }')
+
+    with pytest.raises(ValueError):
+        read_config_file(path)
+
+
+def test_write_yaml_values(tmp_path):
+    path = tmp_path / "config.yaml"
+    write_config_file(path, {"path": Path("out"), "sizes": (1, 2)})
+
+    assert read_config_file(path) == {"path": "out", "sizes": [1, 2]}
+
+
+def test_watch(sample_config_child_class, tmp_path):
+    conf_file = tmp_path / "config.json"
+    conf_file.write_text('{"a": 1}')
+
+    changes: queue.Queue = queue.Queue()
+
+    def update(path, content):
+        path.write_text(content)
+        # make sure the change is detected despite a coarse mtime resolution
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    with sample_config_child_class.watch(
+        conf_file,
+        lambda config, diff: changes.put((config, diff)),
+        overwrite={"b": "fixed"},
+        interval=0.01,
+        debounce=0.02,
+    ) as watcher:
+        assert watcher.config.a == 1
+        assert watcher.config.b == "fixed"
+
+        update(conf_file, '{"a": 2, "c": ["x"]}')
+        config, diff = changes.get(timeout=5)
+
+        assert config.a == 2
+        assert watcher.config is config
+        assert diff == {"a": (1, 2), "c": (["z"], ["x"])}
+
+        # the same values (or invalid values) do not trigger the callback
+        update(conf_file, '{"c": ["x"], "a": 2}')
+        update(conf_file, '{"a": "not a number"}')
+        update(conf_file, '{"a": 3, "c": ["x"]}')
+
+        config, diff = changes.get(timeout=5)
+        assert diff == {"a": (2, 3)}
+        assert changes.empty()
+
+    assert watcher.config.a == 3
+
+
+def test_watch_composed(sample_config_child_class, tmp_path):
+    (tmp_path / "bases").mkdir()
+    base_file = tmp_path / "bases" / "base.json"
+    base_file.write_text('{"a": 1}')
+    conf_file = tmp_path / "config.json"
+    conf_file.write_text('{"__extends__": "bases/base.json", "b": "x"}')
+
+    data, files = read_config_file_and_sources(conf_file)
+    assert data == {"a": 1, "b": "x"}
+    assert [path for path, _ in files] == [str(conf_file), str(base_file)]
+
+    changes: queue.Queue = queue.Queue()
+
+    def update(path, content):
+        path.write_text(content)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    with sample_config_child_class.watch(
+        conf_file,
+        lambda config, diff: changes.put((config, diff)),
+        interval=0.01,
+        debounce=0.02,
+    ):
+        # changes of the base file are detected
+        update(base_file, '{"a": 2}')
+        config, diff = changes.get(timeout=5)
+        assert diff == {"a": (1, 2)}
+
+        # as well as changes of files included later on
+        other_file = tmp_path / "other" / "other.json"
+        other_file.parent.mkdir()
+        other_file.write_text('{"c": ["y"]}')
+        update(
+            conf_file,
+            '{"__extends__": ["bases/base.json", "other/other.json"]}',
+        )
+        config, diff = changes.get(timeout=5)
+        assert diff == {"b": ("x", "test"), "c": (["z"], ["y"])}
+
+        update(other_file, '{"c": ["w"]}')
+        config, diff = changes.get(timeout=5)
+        assert diff == {"c": (["y"], ["w"])}
+        assert config.a == 2
+
+
+def test_merge_configs():
+    base = {"a": 1, "model": {"size": 2, "layers": [1, 2]}, "b": 2}
+    override = {"model": {"layers": [3], "dropout": 0.1}, "c": 3, "a": 0}
+
+    assert merge_configs(base, override) == {
+        "a": 0,
+        "model": {"size": 2, "layers": [3], "dropout": 0.1},
+        "b": 2,
+        "c": 3,
+    }
+    assert list(merge_configs(base, override)) == ["a", "model", "b", "c"]
+    assert base["model"] == {"size": 2, "layers": [1, 2]}
+
+
+def test_composition(tmp_path, monkeypatch):
+    (tmp_path / "bases").mkdir()
+    (tmp_path / "bases" / "base.yaml").write_text(
+        "__include__: common.json\na: 1\nmodel: {size: 2, depth: 3}\n"
+    )
+    (tmp_path / "bases" / "common.json").write_text('{"b": "common"}')
+    (tmp_path / "optimizer.toml").write_text('lr = 0.1\nname = "sgd"\n')
+
+    children = []
+
+    for i in range(3):
+        path = tmp_path / f"child{i}.yaml"
+        path.write_text(
+            "__extends__: bases/base.yaml\n"
+            f"model: {{size: {i}}}\n"
+            "optimizer: {__include__: optimizer.toml, lr: 0.5}\n"
+        )
+        children.append(path)
+
+    parsed = []
+    read = util._read_config_file
+
+    def count_parse(path):
+        parsed.append(Path(path).name)
+        return read(path)
+
+    monkeypatch.setattr(util, "_read_config_file", count_parse)
+
+    for i, path in enumerate(children):
+        assert read_config_file(path) == {
+            "b": "common",
+            "a": 1,
+            "model": {"size": i, "depth": 3},
+            "optimizer": {"lr": 0.5, "name": "sgd"},
+        }
+
+    # included files are parsed once
+    assert sorted(parsed) == sorted(
+        ["child0.yaml", "child1.yaml", "child2.yaml"]
+        + ["base.yaml", "common.json", "optimizer.toml"]
+    )
+
+    # composed files are cached until any of the files changes
+    parsed.clear()
+    read_config_file(children[0])["model"].clear()
+    assert read_config_file(children[0])["model"] == {"size": 0, "depth": 3}
+    assert parsed == []
+
+    (tmp_path / "bases" / "common.json").write_text('{"b": "changed"}')
+    assert read_config_file(children[0])["b"] == "changed"
+    assert parsed == ["child0.yaml", "common.json"]
+
+
+def test_invalid_composition(tmp_path):
+    (tmp_path / "a.json").write_text('{"__extends__": "b.json"}')
+    (tmp_path / "b.json").write_text('{"__include__": ["c.json", "a.json"]}')
+    (tmp_path / "c.json").write_text('{"c": 1}')
+
+    with pytest.raises(
+        CompositionError, match=r"a\.json -> \S*b\.json -> \S*a\.json"
+    ):
+        read_config_file(tmp_path / "a.json")
+
+    (tmp_path / "nested.json").write_text('{"x": {"__extends__": "c.json"}}')
+
+    with pytest.raises(CompositionError, match="top level"):
+        read_config_file(tmp_path / "nested.json")
+
+    (tmp_path / "number.json").write_text('{"__include__": 1}')
+
+    with pytest.raises(CompositionError, match="list of paths"):
+        read_config_file(tmp_path / "number.json")
@@ -0,0 +1,139 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Literal, Optional
+
+import click
+import pytest
+from click.testing import CliRunner
+
+from click_config import ConfigClass, click_config_options, command, field
+from click_config.schema import (
+    InvalidFieldValue,
+    RequiredFieldMissing,
+    get_schema,
+)
+
+
+def test_schema_cache(sample_dataclass_config):
+    schema = get_schema(sample_dataclass_config)
+
+    assert get_schema(sample_dataclass_config) is schema
+    assert schema.field_names == ("a", "b", "c")
+    assert schema.required == ("a",)
+    assert dict(schema.defaults) == {"b": "test"}
+
+
+def test_lazy_help(sample_dataclass_config):
+    schema = get_schema(sample_dataclass_config)
+
+    @command()
+    @click_config_options(sample_dataclass_config)
+    def func(config):
+        pass
+
+    # docstring is not parsed when decorating or invoking the command
+    runner = CliRunner()
+    runner.invoke(func, ["--a", "1"])
+    assert "param_doc" not in vars(schema)
+
+    result = runner.invoke(func, ["--help"])
+    assert "a_help_str" in result.output
+    assert schema.param_doc["a"] == "a_help_str"
+
+
+def test_lazy_help_custom_option():
+    class UpperOption(click.Option):
+        def type_cast_value(self, ctx, value):
+            return value.upper()
+
+    @dataclass
+    class Config:
+        """Some description.
+
+        :param a: a_help_str
+        """
+
+        a: str = field(cls=UpperOption, default="x")
+
+    @command()
+    @click_config_options(Config)
+    def func(config):
+        print(config.a)
+
+    runner = CliRunner()
+    assert runner.invoke(func, ["--a", "y"]).output == "Y\n"
+    assert "a_help_str" in runner.invoke(func, ["--help"]).output
+
+
+def test_loader_conversion():
+    @dataclass
+    class Config(ConfigClass):
+        a: int
+        b: float = 1.0
+        path: Optional[Path] = None
+        choice: Literal["x", "y"] = "x"
+        items: List[int] = field(default_factory=list)
+        paths: List[Path] = field(default_factory=list)
+
+    config = Config.from_dict(
+        {"a": 1, "b": 2, "path": "out", "items": (1, 2), "paths": ["p"]}
+    )
+
+    assert config == Config(
+        a=1, b=2.0, path=Path("out"), items=[1, 2], paths=[Path("p")]
+    )
+    assert isinstance(config.b, float)
+
+    assert Config.from_dict({"a": 1, "path": None}).path is None
+
+    with pytest.raises(RequiredFieldMissing):
+        Config.from_dict({"b": 1.0})
+
+    with pytest.raises(InvalidFieldValue) as exc_info:
+        Config.from_dict({"a": 1, "choice": "z"})
+    assert exc_info.value.field_name == "choice"
+
+    with pytest.raises(InvalidFieldValue):
+        Config.from_dict({"a": 1, "items": 1})
+
+    # overwrites take precedence
+    config = Config.from_dict({"a": 1}, overwrite={"a": 2, "choice": "y"})
+    assert (config.a, config.choice) == (2, "y")
+
+
+def test_invalid_value_cli(sample_config_child_class_routine, tmp_path):
+    conf_file = tmp_path / "config.json"
+
+    with open(conf_file, "w", encoding="utf-8") as f:
+        f.write('{"a": 1, "c": "not a list"}')
+
+    runner = CliRunner()
+    result = runner.invoke(
+        sample_config_child_class_routine, ["--config", str(conf_file)]
+    )
+
+    assert result.exit_code == 2
+    assert "Invalid value for field 'c'" in result.output
+
+
+def test_option_collisions():
+    @dataclass
+    class Config:
+        jobs: int = 1
+        shard: str = field("--part", default="")
+
+    # options of fields must not shadow the options of series
+    with pytest.raises(TypeError, match="--jobs of field 'jobs'"):
+        click_config_options(Config)(lambda config: None)
+
+    @dataclass
+    class Renamed:
+        jobs: int = field("--n-jobs", default=1)
+
+    @command()
+    @click_config_options(Renamed)
+    def func(config):
+        print(config.jobs)
+
+    result = CliRunner().invoke(func, ["--n-jobs", "3", "--jobs", "2"])
+    assert result.output == "3\n"
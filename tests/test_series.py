@@ -0,0 +1,229 @@
+import sys
+from itertools import product
+
+import pytest
+
+from click_config.series import Series
+
+
+@pytest.fixture
+def series():
+    return Series({"b": "test"}, {"a": [0, 1, 2], "c": ["x", "y"], "d": [5]})
+
+
+def test_getitem(series):
+    assert len(series) == 6
+
+    expected = [
+        {"b": "test", "a": a, "c": c, "d": d}
+        for a, c, d in product([0, 1, 2], ["x", "y"], [5])
+    ]
+
+    assert list(series) == expected
+    assert [series[i] for i in range(len(series))] == expected
+    assert series[-1] == expected[-1]
+
+    with pytest.raises(IndexError):
+        series[6]
+
+
+@pytest.mark.parametrize("strided", [False, True])
+@pytest.mark.parametrize("n_shards", [1, 4, 6, 10])
+def test_shard(series, n_shards, strided):
+    shards = [
+        list(series.shard(i, n_shards, strided=strided))
+        for i in range(n_shards)
+    ]
+
+    # shards are disjoint and cover the whole series
+    assert sorted(sum(shards, [])) == list(range(len(series)))
+
+    # shard sizes differ by at most one
+    sizes = [len(shard) for shard in shards]
+    assert max(sizes) - min(sizes) <= 1
+
+
+def test_zip():
+    series = Series(
+        {}, {"a": [0, 1], "__zip__": {"lr": [0.1, 0.01], "bs": [32, 64]}}
+    )
+
+    assert len(series) == 4
+    assert list(series) == [
+        {"a": 0, "lr": 0.1, "bs": 32},
+        {"a": 0, "lr": 0.01, "bs": 64},
+        {"a": 1, "lr": 0.1, "bs": 32},
+        {"a": 1, "lr": 0.01, "bs": 64},
+    ]
+    assert [series[i] for i in range(4)] == list(series)
+
+    with pytest.raises(ValueError):
+        Series({}, {"__zip__": {"lr": [0.1, 0.01], "bs": [32]}})
+
+
+def test_overwrite():
+    series = Series(
+        {},
+        {"a": [0, 1, 1], "__zip__": [{"b": [0, 1], "c": [2, 3]}]},
+        overwrite={"a": 5, "b": 1},
+    )
+
+    assert series.nominal_size == 6
+    assert len(series) == 2
+    assert list(series) == [{"c": 2}, {"c": 3}]
+
+
+def test_exclusions():
+    spec = {
+        "a": [0, 1, 2],
+        "b": ["x", "y"],
+        "c": [True, False],
+        "__exclude__": [
+            {"a": 0, "b": "y"},
+            {"b": "x", "c": False},
+            {"a": 2, "d": 1},  # d is fixed to 0: never matches
+        ],
+    }
+    series = Series({"d": 0}, spec)
+
+    expected = [
+        {"d": 0, "a": a, "b": b, "c": c}
+        for a, b, c in product([0, 1, 2], ["x", "y"], [True, False])
+        if not (a == 0 and b == "y") and not (b == "x" and not c)
+    ]
+
+    assert len(series) == len(expected)
+    assert list(series) == expected
+    assert [series[i] for i in range(len(series))] == expected
+
+    shards = [list(series.points(series.shard(i, 2))) for i in range(2)]
+    assert [point for shard in shards for _, point in shard] == expected
+
+    with pytest.raises(ValueError):
+        Series({"d": 0}, {"a": [0, 1], "__exclude__": [{"d": 0}]})
+
+
+def test_exclusions_defaults():
+    spec = {"a": [0, 1], "__exclude__": [{"a": 0, "b": "test"}]}
+
+    # fields which are only set by their default value are matched as well
+    series = Series({}, spec, defaults={"b": "test"})
+    assert list(series) == [{"a": 1}]
+
+    assert len(Series({"b": "other"}, spec, defaults={"b": "test"})) == 2
+
+    # exclusions of unknown fields would be dropped silently
+    with pytest.raises(ValueError, match="neither varied nor set"):
+        Series({}, spec)
+
+
+def test_constraints(series):
+    constrained = Series(
+        series.data,
+        {"a": [0, 1, 2], "c": ["x", "y"]},
+        overwrite={"b": "other"},
+        constraints=[
+            lambda point: point["a"] != 1,
+            lambda point: point["b"] == "other",
+        ],
+    )
+
+    assert len(constrained) == 4
+    assert [point["a"] for point in constrained] == [0, 0, 2, 2]
+    assert list(constrained.points([1, 3])) == [
+        (1, {"b": "test", "a": 0, "c": "y"}),
+        (3, {"b": "test", "a": 2, "c": "y"}),
+    ]
+
+
+@pytest.fixture
+def huge_series_spec():
+    # 10^9 points
+    return {f"x{i}": list(range(10)) for i in range(9)}
+
+
+@pytest.mark.parametrize("method", ["random", "lhs"])
+def test_sample(huge_series_spec, method):
+    spec = {**huge_series_spec, "__sample__": {"n": 50, "method": method}}
+    series = Series({}, spec)
+
+    assert len(series) == 50
+
+    points = list(series)
+    assert [series[i] for i in range(50)] == points
+
+    # samples are reproducible
+    assert list(Series({}, spec)) == points
+
+    other_seed = {**spec, "__sample__": {**spec["__sample__"], "seed": 1}}
+    assert list(Series({}, other_seed)) != points
+
+    # shards of a sample are disjoint
+    shards = [list(series.points(series.shard(i, 3))) for i in range(3)]
+    assert sorted(i for shard in shards for i, _ in shard) == list(range(50))
+
+
+def test_sample_lhs_strata():
+    series = Series(
+        {}, {"a": list(range(10)), "__sample__": {"n": 10, "method": "lhs"}}
+    )
+
+    # each value is hit exactly once
+    assert sorted(point["a"] for point in series) == list(range(10))
+
+
+@pytest.mark.parametrize("method", ["random", "lhs", "sobol"])
+def test_sample_small_grid(method):
+    if method == "sobol":
+        pytest.importorskip("scipy")
+
+    spec = {"a": [0, 1, 2, 3], "b": [0, 1, 2, 3]}
+
+    # lhs hits some grid points repeatedly: each of them is run once
+    sample_spec = {"n": 8, "method": method, "seed": 1}
+    sample = Series({}, {**spec, "__sample__": sample_spec})
+    points = [tuple(point.values()) for point in sample]
+    assert len(sample) == len(points) == len(set(points))
+
+    # at most the whole grid is sampled
+    sample = Series({}, {**spec, "__sample__": {"n": 50, "method": method}})
+    assert len(sample) <= 16
+    assert len({tuple(point.values()) for point in sample}) == len(sample)
+
+
+def test_sample_sobol_requires_scipy(monkeypatch):
+    monkeypatch.setitem(sys.modules, "scipy", None)
+
+    with pytest.raises(ValueError, match="scipy"):
+        Series({}, {"a": [0, 1], "__sample__": {"n": 1, "method": "sobol"}})
+
+
+def test_sample_random_distinct(huge_series_spec):
+    series = Series({}, {**huge_series_spec, "__sample__": {"n": 1000}})
+    points = {tuple(point.values()) for point in series}
+
+    assert len(points) == 1000
+
+
+def test_sample_sobol(huge_series_spec):
+    pytest.importorskip("scipy")
+
+    spec = {**huge_series_spec, "__sample__": {"n": 64, "method": "sobol"}}
+    assert list(Series({}, spec)) == list(Series({}, spec))
+
+
+def test_sample_exclusions():
+    series = Series(
+        {},
+        {
+            "a": [0, 1],
+            "b": [0, 1],
+            "__exclude__": [{"a": 0}],
+            "__sample__": {"n": 4},
+        },
+    )
+
+    assert list(series) == [{"a": 1, "b": 0}, {"a": 1, "b": 1}]
+
+    with pytest.raises(ValueError):
+        Series({}, {"a": [0, 1], "__sample__": {"n": 4, "method": "grid"}})